@@ -0,0 +1,309 @@
+"""Benchmarks for HardWordleEnv.step, rubric scoring, load_environment and module imports.
+
+Every scenario is built from a seeded RNG, so runs with the same --seed time the same
+guesses, games and completions. Each scenario reports p50/p99 latency and the peak
+bytes allocated per operation (from a separate tracemalloc pass, so tracing does not
+skew the timings).
+
+    python bench_hard_wordle.py --save bench_baseline.json
+    python bench_hard_wordle.py --compare bench_baseline.json
+"""
+import argparse
+import itertools
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+import hard_wordle
+from hard_wordle import HardModeConstraints, HardWordleEnv, completion_analyses, feedback_patterns, load_environment
+
+# Operations traced for allocations per scenario; tracemalloc makes each one several times slower
+ALLOCATION_SAMPLES = 50
+# A p50 more than this many times the baseline's is reported as a regression
+DEFAULT_THRESHOLD = 1.25
+
+# prepare(i) does the untimed setup for iteration i and returns the operation to time
+Prepare = Callable[[int], Callable[[], object]]
+
+
+### measurement
+def percentile(samples: List[float], q: float) -> float:
+    return float(np.percentile(np.asarray(samples), q))
+
+
+def measure(prepare: Prepare, iterations: int) -> Dict[str, float]:
+    """Time `iterations` operations, then trace allocations for a sample of them."""
+    latencies = []
+    for i in range(iterations):
+        op = prepare(i)
+        start = time.perf_counter_ns()
+        op()
+        latencies.append((time.perf_counter_ns() - start) / 1e3)
+
+    allocations = []
+    tracemalloc.start()
+    try:
+        for i in range(min(iterations, ALLOCATION_SAMPLES)):
+            op = prepare(i)
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+            op()
+            allocations.append(tracemalloc.get_traced_memory()[1] - before)
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "iterations": iterations,
+        "p50_us": percentile(latencies, 50),
+        "p99_us": percentile(latencies, 99),
+        "mean_us": float(np.mean(latencies)),
+        "peak_alloc_bytes": int(np.median(allocations)),
+    }
+
+
+### scenarios
+def _fresh_game(env: HardWordleEnv, secret: str, setup_guesses: Tuple[str, ...] = ()) -> None:
+    env.reset(num_players=1)
+    env.state.game_state["secret_word"] = secret
+    for guess in setup_guesses:
+        env.step(f"[{guess}]")
+    env.get_observation()  # drain, so the timed step starts from an empty observation list
+
+
+def _step_scenario(env: HardWordleEnv, games: List[Tuple[str, Tuple[str, ...], str]]) -> Prepare:
+    """Each game is (secret, untimed setup guesses, timed action)."""
+    def prepare(i: int):
+        secret, setup_guesses, action = games[i % len(games)]
+        _fresh_game(env, secret, setup_guesses)
+        return lambda: env.step(action)
+    return prepare
+
+
+def _violation_games(env: HardWordleEnv, rng: random.Random, count: int, kind: str) -> List[Tuple[str, Tuple[str, ...], str]]:
+    """Games whose second guess breaks a green ("position") or yellow ("contain") hint from the first."""
+    words = sorted(env.word_bank.index)
+    games = []
+    while len(games) < count:
+        secret, first = rng.choice(words), rng.choice(words)
+        constraints = HardModeConstraints(env.word_length)
+        code = env.word_bank.score(first, np.array([env.word_bank.index[secret]]))[0]
+        constraints.update(first, feedback_patterns(env.word_length)[code])
+        for _ in range(200):
+            second = rng.choice(words)
+            reason = constraints.violation(second)
+            if reason is not None and kind in reason:
+                games.append((secret, (first,), f"[{second}]"))
+                break
+    return games
+
+
+def _solve(env: HardWordleEnv, secret: str) -> int:
+    """Play a game with a scripted solver that always guesses the first remaining candidate."""
+    _fresh_game(env, secret)
+    index = env.word_bank.index
+    words = env.word_bank.words
+    is_done, turns = False, 0
+    while not is_done:
+        guess = next(words[i] for i in np.flatnonzero(env.candidates) if words[i] in index)
+        is_done, _ = env.step(f"[{guess}]")
+        turns += 1
+    return turns
+
+
+def _synthetic_completion(rng: random.Random, words: List[str], think_words: int) -> List[Dict[str, str]]:
+    completion = []
+    for _ in range(rng.randint(3, 6)):
+        guess = rng.choice(words)
+        think = " ".join(rng.choice(words) for _ in range(think_words))
+        completion.append({"role": "assistant", "content": f"<think>\n{think}\n</think>\n<guess>[{guess}]</guess>"})
+        marks = " ".join(rng.choice("GYX") for _ in guess)
+        completion.append({"role": "user", "content": f"You submitted [{guess}].\nFeedback:\n{' '.join(guess.upper())}\n{marks}\nYou have 3 guesses left."})
+    return completion
+
+
+@contextmanager
+def _data_dir(path: str) -> Iterator[None]:
+    """Point the feedback table / dataset cache at `path` until the block exits."""
+    previous = os.environ.get(hard_wordle.FEEDBACK_TABLE_DIR_ENV_VAR)
+    os.environ[hard_wordle.FEEDBACK_TABLE_DIR_ENV_VAR] = path
+    try:
+        yield
+    finally:
+        if previous is None:
+            os.environ.pop(hard_wordle.FEEDBACK_TABLE_DIR_ENV_VAR, None)
+        else:
+            os.environ[hard_wordle.FEEDBACK_TABLE_DIR_ENV_VAR] = previous
+
+
+def build_scenarios(seed: int, iterations: int, data_dir: str, only: Optional[Sequence[str]] = None) -> Dict[str, Tuple[Prepare, int]]:
+    """Scenario name -> (prepare, iterations); with `only`, just those scenarios are built.
+
+    Each scenario draws from its own RNG, seeded by `seed` and its name, so it times the same
+    operations whether it runs alone or with the others. The load scenarios keep their data
+    dirs under `data_dir`, which the caller removes.
+    """
+
+    @lru_cache(maxsize=None)
+    def game() -> Tuple[HardWordleEnv, List[str], List[str]]:
+        env = HardWordleEnv(word_length=5, num_guesses=6)
+        words = sorted(env.word_bank.index)
+        rng = random.Random(seed)
+        return env, words, [rng.choice(words) for _ in range(iterations)]
+
+    def step(action: Callable[[random.Random, List[str]], str]) -> Callable[[random.Random], Tuple[Prepare, int]]:
+        def build(rng: random.Random) -> Tuple[Prepare, int]:
+            env, words, secrets = game()
+            return _step_scenario(env, [(secret, (), action(rng, words)) for secret in secrets]), iterations
+        return build
+
+    def violations(kind: str) -> Callable[[random.Random], Tuple[Prepare, int]]:
+        def build(rng: random.Random) -> Tuple[Prepare, int]:
+            env, _, _ = game()
+            return _step_scenario(env, _violation_games(env, rng, iterations, kind)), iterations
+        return build
+
+    def full_game(rng: random.Random) -> Tuple[Prepare, int]:
+        env, _, secrets = game()
+        return (lambda i: (lambda: _solve(env, secrets[i % len(secrets)]))), iterations
+
+    def rubric_long_completion(rng: random.Random) -> Tuple[Prepare, int]:
+        # Every completion is scored once, in its own analysis scope like HardWordleRubric.score_rollout
+        _, words, secrets = game()
+        vf_env = load_environment(num_train_examples=10, num_eval_examples=0)
+        parser, rubric = vf_env.parser, vf_env.rubric
+        funcs, weights = rubric.get_reward_funcs(), rubric.get_reward_weights()
+        completions = [_synthetic_completion(rng, words, think_words=400) for _ in range(iterations + ALLOCATION_SAMPLES)]
+        next_completion = itertools.count()
+
+        def score(i: int):
+            completion = completions[next(next_completion)]
+            answer = secrets[i % len(secrets)]
+
+            def op():
+                with completion_analyses():
+                    return sum(weight * func(parser=parser, completion=completion, answer=answer) for func, weight in zip(funcs, weights))
+            return op
+
+        return score, iterations
+
+    # Cold loads start from an empty data dir and word-bank cache; warm loads reuse both
+    load_iterations = max(3, iterations // 50)
+
+    def load_environment_cold(rng: random.Random) -> Tuple[Prepare, int]:
+        cold_dirs = itertools.count()
+
+        def cold_load(i: int):
+            path = os.path.join(data_dir, f"cold-{next(cold_dirs)}")
+            os.mkdir(path)
+            hard_wordle._WORD_BANKS.clear()
+
+            def op():
+                with _data_dir(path):
+                    return load_environment()
+            return op
+
+        return cold_load, load_iterations
+
+    def load_environment_warm(rng: random.Random) -> Tuple[Prepare, int]:
+        warm_dir = os.path.join(data_dir, "warm")
+        os.mkdir(warm_dir)
+        with _data_dir(warm_dir):
+            load_environment()  # populate the cache, untimed
+
+        def warm_load(i: int):
+            def op():
+                with _data_dir(warm_dir):
+                    return load_environment()
+            return op
+
+        return warm_load, load_iterations
+
+    # Each import runs in a fresh interpreter, so the timings include interpreter startup.
+    # hard_wordle_verifiers pulls in verifiers, datasets and openai, which hard_wordle alone defers.
+    def import_module(module: str) -> Callable[[random.Random], Tuple[Prepare, int]]:
+        command = [sys.executable, "-c", f"import {module}"]
+        directory = os.path.dirname(os.path.abspath(__file__))
+        return lambda rng: ((lambda i: (lambda: subprocess.run(command, cwd=directory, check=True, capture_output=True))), load_iterations)
+
+    builders: Dict[str, Callable[[random.Random], Tuple[Prepare, int]]] = {
+        "step_valid": step(lambda rng, words: f"[{rng.choice(words)}]"),
+        "step_invalid_format": step(lambda rng, words: rng.choice(words)),
+        "step_invalid_length": step(lambda rng, words: f"[{rng.choice(words)}s]"),
+        "step_green_violation": violations("position"),
+        "step_yellow_violation": violations("contain"),
+        "full_game": full_game,
+        "rubric_long_completion": rubric_long_completion,
+        "load_environment_cold": load_environment_cold,
+        "load_environment_warm": load_environment_warm,
+        "import_hard_wordle": import_module("hard_wordle"),
+        "import_hard_wordle_verifiers": import_module("hard_wordle_verifiers"),
+    }
+    unknown = sorted(set(only or ()) - set(builders))
+    if unknown:
+        raise ValueError(f"Unknown scenarios: {', '.join(unknown)}; choose from {', '.join(builders)}")
+    return {name: build(random.Random(f"{seed}:{name}")) for name, build in builders.items() if not only or name in only}
+
+
+### baseline
+def compare(results: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]], threshold: float) -> List[str]:
+    """Scenarios whose p50 latency grew by more than `threshold` times the baseline's."""
+    regressions = []
+    for name, stats in results.items():
+        if name not in baseline:
+            continue
+        ratio = stats["p50_us"] / baseline[name]["p50_us"]
+        print(f"{name:<30} p50 {ratio:6.2f}x baseline")
+        if ratio > threshold:
+            regressions.append(name)
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--iterations", type=int, default=500)
+    parser.add_argument("--only", nargs="*", help="Run only these scenarios")
+    parser.add_argument("--save", help="Write the results to this JSON file")
+    parser.add_argument("--compare", help="Compare against a JSON file written by --save")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    args = parser.parse_args(argv)
+
+    results = {}
+    with tempfile.TemporaryDirectory(prefix="hard_wordle_bench_") as data_dir:
+        try:
+            scenarios = build_scenarios(args.seed, args.iterations, data_dir, args.only)
+        except ValueError as e:
+            parser.error(str(e))
+        print(f"{'scenario':<30} {'p50 us':>10} {'p99 us':>10} {'peak alloc B':>13}")
+        for name, (prepare, iterations) in scenarios.items():
+            results[name] = measure(prepare, iterations)
+            print(f"{name:<30} {results[name]['p50_us']:10.1f} {results[name]['p99_us']:10.1f} {results[name]['peak_alloc_bytes']:13d}")
+
+    if args.save:
+        meta = {"seed": args.seed, "python": platform.python_version(), "numpy": np.__version__, "machine": platform.machine()}
+        with open(args.save, "w") as f:
+            json.dump({"meta": meta, "results": results}, f, indent=2)
+        print(f"Baseline written to {args.save}")
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"Regressed by more than {args.threshold}x: {', '.join(regressions)}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
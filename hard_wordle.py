@@ -1,15 +1,30 @@
-
-
 import re
-from typing import Optional, Tuple, List, Dict, Any
-import verifiers as vf
-from verifiers.envs.textarena_env import TextArenaEnv
+import os
+import asyncio
+import hashlib
+import bisect
+import json
+import time
+import itertools
+import sqlite3
+import inspect
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import lru_cache
+from typing import TYPE_CHECKING, Optional, Tuple, List, Dict, Any, Sequence, Iterator
+import numpy as np
+import nltk
 from textarena.envs.Wordle.env import WordleEnv # This import is crucial for inheriting WordleEnv
 import textarena as ta
 from textarena.envs.registration import register_with_versions # Import register_with_versions
-from datasets import Dataset, Features, Value # Import Dataset, Features, Value
 import random # Import random
 
+if TYPE_CHECKING:
+    # verifiers, datasets and openai take seconds to import, so they load on first use; see hard_wordle_verifiers
+    from datasets import Dataset
+    from openai import AsyncOpenAI
+    from openai.types.chat import ChatCompletion
+
 ### prompts
 THINK_GUESS_SYSTEM_PROMPT = """You are a competitive game player. \
 Make sure you read the game instructions carefully, and always follow the required format.
@@ -29,128 +44,826 @@ In each turn, give only your guess inside <guess>...</guess> tags."""
 
 
 ### feedback functions
-def wordle_feedback_fn(observation: str) -> str:
+def wordle_feedback_fn(observation) -> str:
+    if not isinstance(observation, str):
+        # TextArena observations are (from_id, message, type) tuples; keep the game's messages, not the echoed action
+        observation = "\n".join(message for _, message, kind in observation if kind != ta.ObservationType.PLAYER_ACTION)
     if "Feedback:" in observation:
         return observation.split("Feedback:")[-1]
     else:
         return observation
 
 
+### metrics
+# Histogram bucket upper bounds in nanoseconds, 1us to 1s
+PHASE_BUCKETS_NS = (1_000, 2_500, 5_000, 10_000, 25_000, 50_000, 100_000, 250_000, 500_000,
+                    1_000_000, 2_500_000, 5_000_000, 10_000_000, 25_000_000, 50_000_000, 100_000_000, 1_000_000_000)
+
+
+class PhaseHistogram:
+    """Fixed-bucket latency histogram fed from time.perf_counter_ns()."""
+
+    __slots__ = ("counts", "total_ns")
+
+    def __init__(self):
+        self.counts = [0] * (len(PHASE_BUCKETS_NS) + 1)  # last bucket is +Inf
+        self.total_ns = 0
+
+    def observe(self, elapsed_ns: int) -> None:
+        self.counts[bisect.bisect_left(PHASE_BUCKETS_NS, elapsed_ns)] += 1
+        self.total_ns += elapsed_ns
+
+    def cumulative(self) -> List[Tuple[str, int]]:
+        """(le, cumulative count) pairs with `le` in seconds, as Prometheus expects."""
+        bounds = [f"{bound / 1e9:g}" for bound in PHASE_BUCKETS_NS] + ["+Inf"]
+        return list(zip(bounds, itertools.accumulate(self.counts)))
+
+
+class EnvMetrics:
+    """Per-phase step/reward timings and invalid-move counters, collected while metrics are enabled."""
+
+    def __init__(self):
+        self.phases: Dict[str, PhaseHistogram] = {}
+        self.invalid_moves: Dict[str, int] = {}
+
+    def lap(self, phase: str, since_ns: int) -> int:
+        """Record the time since `since_ns` under `phase`; returns now, to start the next phase."""
+        now = time.perf_counter_ns()
+        histogram = self.phases.get(phase)
+        if histogram is None:
+            histogram = self.phases[phase] = PhaseHistogram()
+        histogram.observe(now - since_ns)
+        return now
+
+    def count_invalid(self, kind: str) -> None:
+        self.invalid_moves[kind] = self.invalid_moves.get(kind, 0) + 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "phases": {
+                phase: {"buckets": dict(histogram.cumulative()), "sum_seconds": histogram.total_ns / 1e9, "count": sum(histogram.counts)}
+                for phase, histogram in self.phases.items()
+            },
+            "invalid_moves": dict(self.invalid_moves),
+        }
+
+    def to_prometheus(self) -> str:
+        lines = [
+            "# HELP hard_wordle_phase_seconds Time spent in each HardWordleEnv step and reward phase.",
+            "# TYPE hard_wordle_phase_seconds histogram",
+        ]
+        for phase, histogram in self.phases.items():
+            for le, count in histogram.cumulative():
+                lines.append(f'hard_wordle_phase_seconds_bucket{{phase="{phase}",le="{le}"}} {count}')
+            lines.append(f'hard_wordle_phase_seconds_sum{{phase="{phase}"}} {histogram.total_ns / 1e9}')
+            lines.append(f'hard_wordle_phase_seconds_count{{phase="{phase}"}} {sum(histogram.counts)}')
+        lines.append("# HELP hard_wordle_invalid_moves_total Invalid moves by category.")
+        lines.append("# TYPE hard_wordle_invalid_moves_total counter")
+        for kind, count in self.invalid_moves.items():
+            lines.append(f'hard_wordle_invalid_moves_total{{kind="{kind}"}} {count}')
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path: str) -> None:
+        """Write a textfile-collector file; replaced atomically so scrapes never see half of it."""
+        self._write(path, self.to_prometheus())
+
+    def write_json(self, path: str) -> None:
+        self._write(path, json.dumps(self.snapshot(), indent=2))
+
+    @staticmethod
+    def _write(path: str, text: str) -> None:
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+
+
+# None while disabled, so the hot paths only pay for one global lookup
+_METRICS: Optional[EnvMetrics] = None
+
+
+def enable_metrics() -> EnvMetrics:
+    """Start collecting step and reward metrics; returns the (new or current) collector."""
+    global _METRICS
+    if _METRICS is None:
+        _METRICS = EnvMetrics()
+    return _METRICS
+
+
+def disable_metrics() -> Optional[EnvMetrics]:
+    """Stop collecting; returns what was collected so far."""
+    global _METRICS
+    metrics, _METRICS = _METRICS, None
+    return metrics
+
+
 ### reward functions
+class CompletionAnalysis:
+    """What the reward functions read from one completion, gathered in a single pass.
+
+    `guess` is what `parser.parse_answer` returns, `scoring` is the last feedback row
+    (e.g. "G Y X X X") or None, and `format_score` is what the XMLParser format reward returns.
+    """
+    __slots__ = ("guess", "num_turns", "scoring", "format_score")
+
+    def __init__(self, guess: Optional[str], num_turns: int, scoring: Optional[str], format_score: float):
+        self.guess = guess
+        self.num_turns = num_turns
+        self.scoring = scoring
+        self.format_score = format_score
+
+
+# Every reward function of a rollout is called with the same completion list. Inside
+# completion_analyses() the first call's analysis is kept for the others; each entry holds the
+# completion itself, so its id() can't be reused while the scope lasts
+_ANALYSES: ContextVar[Optional[Dict[int, Tuple[Any, Any, CompletionAnalysis]]]] = ContextVar("hard_wordle_analyses", default=None)
+
+
+@contextmanager
+def completion_analyses() -> Iterator[None]:
+    """Share analyze_completion results between reward functions until the block exits."""
+    token = _ANALYSES.set({})
+    try:
+        yield
+    finally:
+        _ANALYSES.reset(token)
+# A feedback row of the board, e.g. "G Y X X X"; indented under the guess on multi-board games
+_FEEDBACK_ROW = re.compile(r"^[ \t]*([GYX](?: [GYX])+)[ \t]*$", re.MULTILINE)
+
+
+def _xml_field(content: str, tag: str) -> Optional[str]:
+    """Same result as XMLParser.parse for one tag: the stripped text inside the first <tag>...</tag>."""
+    start = content.find(f"<{tag}>")
+    if start < 0:
+        return None
+    start += len(tag) + 2
+    end = content.find(f"</{tag}>", start)
+    if end < 0:
+        return None
+    return content[start:end].strip()
+
+
+def _format_score(content: str, fields: List[str], values: List[Optional[str]]) -> float:
+    # Mirrors XMLParser.get_format_reward_func term by term, so the float result is identical
+    has_any_field = any(value is not None for value in values)
+    present = sum(
+        1 for tag, value in zip(fields, values)
+        if value is not None or f"<{tag}>" in content or f"</{tag}>" in content
+    )
+    stripped = content.strip()
+    format_score = 0.0
+    if has_any_field:
+        format_score += 0.4 * (present / len(fields))
+    format_score += 0.2  # spacing: the unstripped parse matches exactly when the stripped one does
+    if stripped.startswith(f"<{fields[0]}>"):
+        format_score += 0.2
+    if stripped.endswith(f"</{fields[-1]}>"):
+        format_score += 0.2
+    return format_score
+
+
+def analyze_completion(parser, completion) -> CompletionAnalysis:
+    """Scan `completion` once; inside completion_analyses() the other reward functions reuse the result."""
+    analyses = _ANALYSES.get()
+    key = id(completion)
+    cached = analyses.get(key) if analyses is not None else None
+    if cached is not None and cached[0] is completion and cached[1] is parser:
+        return cached[2]
+
+    metrics = _METRICS
+    if metrics is not None:
+        start = time.perf_counter_ns()
+    fields = parser.get_fields()
+    answer_index = fields.index(parser.answer_field) if parser.answer_field in fields else None
+    guess = None
+    num_assistant = num_turns = 0
+    format_scores = []
+    last_user_content = None
+    for message in completion:
+        if message["role"] == "user":
+            last_user_content = message["content"]
+            continue
+        if message["role"] != "assistant":
+            continue
+        content = message["content"]
+        # If the first assistant message is just the initial prompt, don't count it as a turn
+        if not (num_assistant == 0 and "Welcome to Wordle!" in content):
+            num_turns += 1
+        num_assistant += 1
+        values = [_xml_field(content, tag) for tag in fields]
+        if answer_index is not None and values[answer_index] is not None:
+            guess = values[answer_index]
+        format_scores.append(_format_score(content, fields, values))
+
+    scoring = None
+    if last_user_content is not None:
+        # The last feedback row of the board, e.g. "G Y X X X" under "W O R D S". wordle_feedback_fn
+        # drops the "Feedback:" marker, and invalid move messages have no rows; other lines such as
+        # "You have 5 guesses left." are not rows even though they contain marks
+        rows = _FEEDBACK_ROW.findall(last_user_content)
+        if rows:
+            scoring = rows[-1]
+
+    format_score = sum(format_scores) / len(format_scores) if format_scores else 0.0
+    analysis = CompletionAnalysis(guess, num_turns, scoring, format_score)
+    if analyses is not None:
+        analyses[key] = (completion, parser, analysis)
+    if metrics is not None:
+        metrics.lap("reward_analysis", start)
+    return analysis
+
+
 def check_answer_reward_func(parser, completion, answer, **kwargs) -> float:
-    guess = parser.parse_answer(completion)
+    guess = analyze_completion(parser, completion).guess
     return 1.0 if guess == "[" + answer + "]" else 0.0
 
 
 def count_turns_reward_func(parser, completion, answer, **kwargs) -> float:
-    # Ensure num_turns accounts for the assistant's initial message if present
-    assistant_messages = [x for x in completion if x["role"] == "assistant"]
-    num_turns = len(assistant_messages)
-    # If the first assistant message is just the initial prompt, don't count it as a turn
-    if num_turns > 0 and "Welcome to Wordle!" in assistant_messages[0].get("content", ""):
-        num_turns -= 1 
-        
+    # Turns exclude an initial "Welcome to Wordle!" assistant message, see analyze_completion
+    num_turns = analyze_completion(parser, completion).num_turns
     is_correct = check_answer_reward_func(parser, completion, answer, **kwargs)
     return is_correct / (num_turns + 1)
 
 
-def partial_credit_reward_func(parser, completion, **kwargs) -> float:
-    """Reward function that gives partial credit for the correct guess."""
-    final_env_response = parser.get_user_messages(completion)[-1]["content"].strip()
-    
-    # Check if final_env_response contains 'Feedback:' to determine if it's a game message or invalid move message
-    if "Feedback:" in final_env_response:
-        feedback_line = final_env_response.split("Feedback:")[-1].strip()
-        # The feedback line will be the second line of the board, e.g., "W O R D L E\nGYXXX"
-        if "\n" in feedback_line:
-            scoring = feedback_line.split("\n")[-1].strip()
-            num_greens = scoring.count("G")
-            num_yellows = scoring.count("Y")
-            return 0.2 * num_greens + 0.1 * num_yellows
-    return 0.0 # Return 0.0 if no valid feedback is found (e.g., due to an invalid move or initial prompt)
+def partial_credit_reward_func(parser, completion, answer="", **kwargs) -> float:
+    """Reward function that gives partial credit for the correct guess.
+
+    0.2 per green and 0.1 per yellow of the last feedback row on 5-letter words; other word
+    lengths (taken from the answer) get the same credit per word, 1 for all greens.
+    """
+    scoring = analyze_completion(parser, completion).scoring
+    if scoring is None:
+        return 0.0 # Return 0.0 if no valid feedback is found (e.g., due to an invalid move or initial prompt)
+    num_greens = scoring.count("G")
+    num_yellows = scoring.count("Y")
+    word_length = len(answer.split()[0]) if answer.strip() else 5
+    if word_length == 5:
+        return 0.2 * num_greens + 0.1 * num_yellows
+    return (num_greens + 0.5 * num_yellows) / word_length
+
+
+def format_reward_func(parser, completion, **kwargs) -> float:
+    """The XMLParser format reward (average per-message format adherence), from the shared analysis."""
+    return analyze_completion(parser, completion).format_score
+
+
+### parallel scoring
+# score_completions scores outside verifiers' async loop: HardWordleRubric (hard_wordle_verifiers)
+# runs it on shards in worker processes, and write_baseline on the solver's games.
+# Below this many rollouts the process pool costs more than it saves
+PARALLEL_SCORING_MIN_ROLLOUTS = 64
+
+
+def _compact_completion(completion) -> Tuple[Tuple[str, str], ...]:
+    """The (role, content) pairs the reward functions read; everything else stays in the parent."""
+    return tuple((message["role"], message["content"]) for message in completion if message["role"] in ("assistant", "user"))
+
+
+def _call_reward_func(func, parser, completion, answer) -> float:
+    # Same argument filtering and error handling as Rubric.call_reward_func
+    args = {"parser": parser, "completion": completion, "answer": answer}
+    parameters = inspect.signature(func).parameters
+    if not any(parameter.kind == parameter.VAR_KEYWORD for parameter in parameters.values()):
+        args = {key: value for key, value in args.items() if key in parameters}
+    try:
+        return float(func(**args))
+    except Exception:
+        return 0.0
+
+
+def score_completions(parser, rubric, completions, answers: Sequence[str]) -> np.ndarray:
+    """Score finished completions with the rubric's reward functions and weights, synchronously.
+
+    Row i is [reward, *metrics] for completions[i], metrics in get_reward_func_names() order;
+    the values match Rubric.score_rollout exactly. Completions are message lists, or tuples of
+    (role, content) pairs as sent to HardWordleRubric's worker processes. Reward functions may
+    only use `parser`, `completion` and `answer`.
+    """
+    compact = [completion if isinstance(completion, tuple) else _compact_completion(completion) for completion in completions]
+    return _score_shard(parser, rubric.get_reward_funcs(), rubric.get_reward_weights(), compact, answers)
+
+
+def _score_shard(parser, funcs, weights, completions, answers) -> np.ndarray:
+    """Score compact completions in a worker process; row i is [reward, *metrics] for completions[i]."""
+    scores = np.empty((len(completions), len(funcs) + 1))
+    for row, (compact, answer) in enumerate(zip(completions, answers)):
+        completion = [{"role": role, "content": content} for role, content in compact]
+        with completion_analyses():
+            rewards = [_call_reward_func(func, parser, completion, answer) for func in funcs]
+        # Summed as a list in order, like Rubric.score_rollout, so the float is bit-identical
+        scores[row, 0] = sum([reward * weight for reward, weight in zip(rewards, weights)])
+        scores[row, 1:] = rewards
+    return scores
+
+
+### scoring kernels
+# Feedback for a whole guess is packed into one base-3 integer: position i contributes
+# mark * 3**i with X=0, Y=1, G=2. Five letters fit in a uint8 (max code 242), six and
+# seven need a uint16 (max 728 and 2186).
+FEEDBACK_MARKS = ("X", "Y", "G")
+FEEDBACK_TABLE_DIR_ENV_VAR = "HARD_WORDLE_DATA_DIR"
+ALPHABET_SIZE = 26
+
+
+def encode_words(words: Sequence[str]) -> np.ndarray:
+    """Encode equal-length words as an (N, word_length) uint8 array of letter indices (a=0)."""
+    joined = "".join(words).lower()
+    if not (joined.isascii() and joined.isalpha()):
+        raise ValueError("Only words made of ASCII letters can be encoded.")
+    codes = np.frombuffer(joined.encode("ascii"), dtype=np.uint8) - ord("a")
+    return codes.reshape(len(words), -1)
+
+
+def _score_letters(letters: List[Any], answer_letters: List[np.ndarray], shape: Tuple[int, ...]) -> np.ndarray:
+    """Feedback codes from per-position guess and answer letters that broadcast to `shape`.
+
+    Matches `WordleEnv._evaluate_guess`: greens first, then yellows left to right,
+    each consuming one occurrence of the letter not already matched by a green.
+    """
+    word_length = len(letters)
+    green = [answer_letters[i] == letters[i] for i in range(word_length)]
+    # Answer letters not matched by a green; 255 never equals a letter index
+    open_letters = [np.where(green[j], np.uint8(255), answer_letters[j]) for j in range(word_length)]
+    yellow = []
+    codes = np.zeros(shape, dtype=np.uint16)
+    for i in range(word_length):
+        available = np.zeros(shape, dtype=np.uint8)
+        for j in range(word_length):
+            available += (open_letters[j] == letters[i]).view(np.uint8)
+        for k in range(i):
+            # earlier yellows of the same letter have already consumed an occurrence
+            same = letters[k] == letters[i]
+            if np.any(same):
+                available -= (yellow[k] & same).view(np.uint8)
+        yellow.append((available > 0) & ~green[i])
+        codes += (2 * green[i].view(np.uint8) + yellow[i].view(np.uint8)) * np.uint16(3 ** i)
+    return codes
+
+
+def score_guesses(guesses: np.ndarray, answers: np.ndarray) -> np.ndarray:
+    """Base-3 feedback codes for every (guess, answer) pair, shape (G, N)."""
+    guesses = np.atleast_2d(guesses)
+    answers = np.atleast_2d(answers)
+    if len(guesses) == 1:
+        # Scalar letters keep numpy on its fast path instead of broadcasting (1, 1) arrays
+        letters = [int(letter) for letter in guesses[0]]
+    else:
+        letters = list(guesses.T[:, :, None])  # (G, 1) per position
+    answer_letters = list(answers.T[:, None, :])  # (1, N) per position
+    return _score_letters(letters, answer_letters, (len(guesses), len(answers)))
+
+
+def score_pairs(guesses: np.ndarray, answers: np.ndarray) -> np.ndarray:
+    """Base-3 feedback codes of guesses[n] against answers[n], shape (N,)."""
+    return _score_letters(list(guesses.T), list(answers.T), (len(guesses),))
+
+
+def feedback_dtype(word_length: int) -> np.dtype:
+    """Smallest unsigned type holding every feedback code: uint8 up to 5 letters, uint16 up to 10."""
+    if word_length > 10:
+        raise ValueError("Feedback codes only fit in uint16 for words of up to 10 letters.")
+    return np.dtype(np.uint8 if 3 ** word_length <= 256 else np.uint16)
+
+
+def feedback_code(feedback: Sequence[str]) -> int:
+    """Base-3 code of a feedback pattern such as ["G", "Y", "X", "X", "G"]."""
+    return sum(FEEDBACK_MARKS.index(mark) * 3 ** i for i, mark in enumerate(feedback))
+
+
+@lru_cache(maxsize=None)
+def feedback_patterns(word_length: int) -> Tuple[Tuple[str, ...], ...]:
+    """All feedback patterns indexed by their base-3 code."""
+    patterns = []
+    for code in range(3 ** word_length):
+        marks = []
+        for _ in range(word_length):
+            code, mark = divmod(code, 3)
+            marks.append(FEEDBACK_MARKS[mark])
+        patterns.append(tuple(marks))
+    return tuple(patterns)
+
+
+def feedback_table_dir() -> str:
+    """Directory for precomputed feedback tables: $HARD_WORDLE_DATA_DIR, else next to the nltk words corpus."""
+    directory = os.environ.get(FEEDBACK_TABLE_DIR_ENV_VAR)
+    if directory:
+        return directory
+    pointer = nltk.data.find("corpora/words")
+    if isinstance(pointer, nltk.data.FileSystemPathPointer):
+        return pointer.path
+    return os.path.dirname(pointer.zipfile.filename)
+
+
+class WordBank:
+    """Letter-encoded view of a word list, shared by every env built from the same list.
+
+    Feedback tables are keyed by a digest of the word list, so a table built for one
+    dictionary is never picked up for another.
+    """
+
+    def __init__(self, words: Sequence[str]):
+        self.words = list(words)
+        self.codes = encode_words(self.words)
+        self.word_length = self.codes.shape[1]
+        # Guesses are lowercased before scoring, so only lowercase entries can be looked up
+        self.index = {word: i for i, word in enumerate(self.words) if word.islower()}
+        self.digest = hashlib.sha1("\n".join(self.words).encode()).hexdigest()[:16]
+        self._feedback_table = None
+        self._feedback_table_file: Optional[str] = None  # resolved on the first lookup
+        self._feedback_table_dir_mtime: Optional[int] = None  # data dir mtime when the table was last missing
+
+    def __deepcopy__(self, memo):
+        # Read-only and possibly memory-mapped: copies of an env keep sharing it
+        return self
+
+    def feedback_table_path(self, directory: Optional[str] = None) -> str:
+        directory = directory or feedback_table_dir()
+        return os.path.join(directory, f"hard_wordle_feedback_{self.word_length}_{self.digest}.npy")
+
+    def feedback_table(self) -> Optional[np.ndarray]:
+        """The guess x answer table of feedback codes, memory-mapped, or None if it was never built.
+
+        While the table is missing, the data directory is only searched again once its mtime
+        changes, so a table built later by another process is picked up on the next lookup.
+        """
+        if self._feedback_table is None:
+            if self._feedback_table_file is None:
+                try:
+                    self._feedback_table_file = self.feedback_table_path()
+                except LookupError:
+                    self._feedback_table_file = ""
+            if not self._feedback_table_file:
+                return None
+            try:
+                mtime = os.stat(os.path.dirname(self._feedback_table_file)).st_mtime_ns
+            except FileNotFoundError:
+                mtime = -1
+            if mtime != self._feedback_table_dir_mtime:
+                self._feedback_table_dir_mtime = mtime
+                if os.path.exists(self._feedback_table_file):
+                    self._feedback_table = np.load(self._feedback_table_file, mmap_mode="r")
+        return self._feedback_table
+
+    def build_feedback_table(self, directory: Optional[str] = None, chunk_size: int = 64) -> str:
+        """Precompute the feedback table and write it as .npy; returns the path."""
+        path = self.feedback_table_path(directory)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        n = len(self.words)
+        table = np.lib.format.open_memmap(tmp_path, mode="w+", dtype=feedback_dtype(self.word_length), shape=(n, n))
+        for start in range(0, n, chunk_size):
+            table[start:start + chunk_size] = score_guesses(self.codes[start:start + chunk_size], self.codes)
+        table.flush()
+        del table
+        os.replace(tmp_path, path)  # atomic, so concurrent workers never map a half-written file
+        self._feedback_table = None
+        self._feedback_table_file = None
+        self._feedback_table_dir_mtime = None
+        return path
+
+    def score(self, guess: str, answer_ids: np.ndarray) -> np.ndarray:
+        """Feedback codes of `guess` against the given answers, from the table when possible."""
+        table = self.feedback_table()
+        guess_id = self.index.get(guess)
+        if table is not None and guess_id is not None:
+            return table[guess_id, answer_ids]
+        return score_guesses(encode_words([guess]), self.codes[answer_ids])[0]
+
+    def score_ids(self, guess_ids: np.ndarray, answer_ids: np.ndarray) -> np.ndarray:
+        """Feedback codes for every (guess, answer) pair of word ids, shape (G, N)."""
+        table = self.feedback_table()
+        if table is not None:
+            return table[np.ix_(guess_ids, answer_ids)]
+        return score_guesses(self.codes[guess_ids], self.codes[answer_ids])
+
+    def evaluate(self, guess: str, secret: str) -> Optional[List[str]]:
+        """Feedback from the precomputed table, or None if the table or either word is unavailable."""
+        table = self.feedback_table()
+        if table is None:
+            return None
+        guess_id = self.index.get(guess)
+        secret_id = self.index.get(secret)
+        if guess_id is None or secret_id is None:
+            return None
+        return list(feedback_patterns(self.word_length)[table[guess_id, secret_id]])
+
+
+_WORD_BANKS: Dict[Tuple[str, ...], WordBank] = {}
+
+
+def get_word_bank(words: Sequence[str]) -> WordBank:
+    """Process-wide WordBank for a word list, built on first use."""
+    key = tuple(words)
+    if key not in _WORD_BANKS:
+        _WORD_BANKS[key] = WordBank(key)
+    return _WORD_BANKS[key]
+
+
+### move validation
+# Word characters of a guess token, as matched by WordleEnv's r"\[(\w+)\]"
+_WORD_CHARS = re.compile(r"\w+")
+
+
+def extract_guess(action: str) -> Optional[str]:
+    """The last bracketed word in `action` ("... [crane]" -> "crane"), or None.
+
+    Scans back from the end of the action, so reasoning before the guess costs a
+    reverse search for '[' rather than a regex pass over the whole text.
+    """
+    end = len(action)
+    while True:
+        start = action.rfind("[", 0, end)
+        if start < 0:
+            return None
+        match = _WORD_CHARS.match(action, start + 1)
+        if match is not None and action.startswith("]", match.end()):
+            return match.group()
+        end = start
+
+
+# Kind of every reason handed out by invalid_move_reason, for the invalid-move counters
+_REASON_KINDS: Dict[str, str] = {}
+
+
+@lru_cache(maxsize=None)
+def invalid_move_reason(kind: str, letter: str = "", value: int = 0) -> str:
+    """Interned invalid-move reason, keyed by (kind, letter, value).
+
+    Kinds: "format"; "length" with the required length as `value`; "green" with the
+    0-based position of `letter`; "missing" with the number of times `letter` must appear.
+    """
+    reason = _invalid_move_text(kind, letter, value)
+    _REASON_KINDS[reason] = kind
+    return reason
+
+
+def _invalid_move_text(kind: str, letter: str, value: int) -> str:
+    if kind == "format":
+        return "You tried submitting a word in the wrong format. Please make sure to use squared brackets."
+    if kind == "length":
+        return f"Your word must be exactly {value} letters."
+    if kind == "green":
+        return f"Hard Mode violation: Letter '{letter.upper()}' must be in position {value + 1}."
+    if kind == "missing":
+        if value == 1:
+            return f"Hard Mode violation: Guess must contain letter '{letter.upper()}'."
+        return f"Hard Mode violation: Guess must contain letter '{letter.upper()}' at least {value} times."
+    raise ValueError(f"Unknown invalid move kind: {kind!r}")
+
+
+class HardModeConstraints:
+    """Cumulative hard-mode rules for one episode, updated as each valid guess is scored.
+
+    Greens pin a letter to a position and every green or yellow raises that letter's
+    minimum count, so hints from all earlier turns stay binding. Like standard hard mode,
+    a yellow letter may be guessed again in the same position.
+    """
+
+    __slots__ = ("greens", "min_counts")
+
+    def __init__(self, word_length: int):
+        self.greens: List[Optional[str]] = [None] * word_length  # letter pinned at each position, or None
+        self.min_counts: Dict[str, int] = {}  # {letter: minimum occurrences}
+
+    def update(self, word: str, feedback: Sequence[str]) -> None:
+        counts: Dict[str, int] = {}
+        for pos, (letter, feedback_type) in enumerate(zip(word, feedback)):
+            if feedback_type == "G":
+                self.greens[pos] = letter
+            if feedback_type in ("G", "Y"):
+                counts[letter] = counts.get(letter, 0) + 1
+        for letter, count in counts.items():
+            if count > self.min_counts.get(letter, 0):
+                self.min_counts[letter] = count
+
+    def copy(self) -> "HardModeConstraints":
+        other = HardModeConstraints.__new__(HardModeConstraints)
+        other.greens = list(self.greens)
+        other.min_counts = dict(self.min_counts)
+        return other
+
+    def violation(self, word: str) -> Optional[str]:
+        """Reason `word` breaks hard mode, or None if it is allowed."""
+        for pos, req_letter in enumerate(self.greens):
+            if req_letter is not None and word[pos] != req_letter:
+                return invalid_move_reason("green", req_letter, pos)
+        for req_letter, count in self.min_counts.items():
+            if word.count(req_letter) < count:
+                return invalid_move_reason("missing", req_letter, count)
+        return None
+
+
+class ConstraintArrays:
+    """HardModeConstraints for many rows at once (games of a batch, or boards of one game).
+
+    Letters are indices a=0; ALPHABET_SIZE stands for a non-letter and never satisfies a hint.
+    Violation reasons name the same green position or missing letter as HardModeConstraints.
+    """
+
+    def __init__(self, num_rows: int, word_length: int):
+        self.word_length = word_length
+        self.greens = np.full((num_rows, word_length), -1, dtype=np.int16)
+        self.min_counts = np.zeros((num_rows, ALPHABET_SIZE), dtype=np.uint8)
+        # Order in which letters were first hinted, so reasons name the same letter as HardModeConstraints
+        self.hint_order = np.full((num_rows, ALPHABET_SIZE), np.iinfo(np.int64).max, dtype=np.int64)
+
+    def violations(self, rows: np.ndarray, letters: np.ndarray) -> List[Optional[str]]:
+        """Reason letters[i] breaks the rules of row rows[i], or None, for every i."""
+        green_miss = (self.greens[rows] >= 0) & (letters != self.greens[rows])
+        letter_counts = (letters[:, :, None] == np.arange(ALPHABET_SIZE)).sum(axis=1)
+        short = letter_counts < self.min_counts[rows]
+        reasons: List[Optional[str]] = [None] * len(rows)
+        for i in np.flatnonzero(green_miss.any(axis=1)):
+            pos = int(green_miss[i].argmax())
+            reasons[i] = invalid_move_reason("green", chr(ord("a") + int(self.greens[rows[i], pos])), pos)
+        for i in np.flatnonzero(short.any(axis=1) & ~green_miss.any(axis=1)):
+            letter = int(np.where(short[i], self.hint_order[rows[i]], np.iinfo(np.int64).max).argmin())
+            reasons[i] = invalid_move_reason("missing", chr(ord("a") + letter), int(self.min_counts[rows[i], letter]))
+        return reasons
+
+    def update(self, rows: np.ndarray, letters: np.ndarray, marks: np.ndarray, turns: np.ndarray) -> None:
+        """Fold scored guesses into rows; `marks` are per-position 0/1/2 (X/Y/G), `turns` their guess numbers."""
+        length = self.word_length
+        self.greens[rows] = np.where(marks == 2, letters, self.greens[rows])
+        onehot = letters[:, :, None] == np.arange(ALPHABET_SIZE)  # (k, L, 26)
+        hinted = onehot & (marks > 0)[:, :, None]
+        counts = hinted.sum(axis=1)
+        first_hint = np.where(hinted, np.arange(length)[None, :, None], length).min(axis=1)
+        newly_hinted = (counts > 0) & (self.min_counts[rows] == 0)
+        self.hint_order[rows] = np.where(newly_hinted, turns[:, None] * length + first_hint, self.hint_order[rows])
+        self.min_counts[rows] = np.maximum(self.min_counts[rows], counts)
+
+    def copy(self) -> "ConstraintArrays":
+        other = ConstraintArrays.__new__(ConstraintArrays)
+        other.word_length = self.word_length
+        other.greens = self.greens.copy()
+        other.min_counts = self.min_counts.copy()
+        other.hint_order = self.hint_order.copy()
+        return other
+
+
+HARD_MODE_ERROR_ALLOWANCE = 10
+
+
+class GameSnapshot:
+    """Immutable record of a HardWordleEnv game, for branching it without replaying moves.
+
+    Guesses are packed as words plus base-3 feedback codes. The candidate mask is shared with
+    the env rather than copied: the env replaces the mask on every scored guess instead of
+    writing to it, so snapshots taken earlier keep seeing their own.
+    """
+
+    __slots__ = ("secret", "words", "codes", "constraints", "candidates", "remaining_candidates",
+                 "turn", "error_count", "done", "rewards", "game_info", "rendered_board", "player_view")
+
+    def __init__(self, secret: str, words: Tuple[str, ...], codes: Tuple[int, ...], constraints: HardModeConstraints,
+                 candidates: np.ndarray, remaining_candidates: int, turn: int, error_count: int, done: bool,
+                 rewards: Optional[Dict[int, float]], game_info: Dict[str, Any], rendered_board: Optional[str], player_view: Optional[str]):
+        self.secret = secret
+        self.words = words
+        self.codes = codes
+        self.constraints = constraints
+        self.candidates = candidates
+        self.remaining_candidates = remaining_candidates
+        self.turn = turn
+        self.error_count = error_count
+        self.done = done
+        self.rewards = rewards
+        self.game_info = game_info
+        self.rendered_board = rendered_board
+        self.player_view = player_view
+
+
+class MultiBoardSnapshot(GameSnapshot):
+    """GameSnapshot of a MultiBoardHardWordleEnv game.
+
+    `codes` holds one tuple of board codes per guess (-1 for boards already solved),
+    `constraints` is the boards' ConstraintArrays and `candidates` their (boards, words) mask,
+    shared with the env like the single-board mask.
+    """
+
+    __slots__ = ("solved", "last_codes")
+
+    def __init__(self, solved: np.ndarray, last_codes: np.ndarray, **fields: Any):
+        super().__init__(**fields)
+        self.solved = solved
+        self.last_codes = last_codes
 
 
 class HardWordleEnv(WordleEnv):
-    def __init__(self, word_length: int = 5, num_guesses: int = 6, hardcore: bool = False): # Added hardcore to __init__
+    def __init__(self, word_length: int = 5, num_guesses: int = 6, hardcore: bool = False, compact_history: bool = False): # Added hardcore to __init__
         super().__init__(word_length=word_length, num_guesses=num_guesses, hardcore=True)
         # The `hardcore=True` here ensures the larger dictionary is used,
         # but we still need to implement the letter-inclusion rule.
         # Set higher error allowance to allow hard mode violations without ending the game
         # Note: state is created by parent __init__, so we set error_allowance in reset()
+        # Encoded word list; scores guesses from a precomputed feedback table when one exists
+        self.word_bank = get_word_bank(self.word_list)
+        # Drop raw action text and keep only the latest observation; move_log keeps the structure
+        self.compact_history = compact_history
+
+    @property
+    def word_bank(self) -> WordBank:
+        return self._word_bank
+
+    @word_bank.setter
+    def word_bank(self, word_bank: WordBank) -> None:
+        # Candidate masks index the word bank, so a bank swapped in mid-game gets its own
+        self._word_bank = word_bank
+        if getattr(self, "history_codes", None) is not None:
+            self._rebuild_candidates()
+
+    def _rebuild_candidates(self) -> None:
+        """Recompute the candidate mask over the current word bank from the guesses scored so far."""
+        word_bank = self.word_bank
+        keep = np.arange(len(word_bank.words))
+        for (word, _), code in zip(self.state.game_state["guess_history"], self.history_codes):
+            keep = keep[word_bank.score(word, keep) == code]
+        self.candidates = np.zeros(len(word_bank.words), dtype=bool)
+        self.candidates[keep] = True
+        self.remaining_candidates = len(keep)
 
     def reset(self, num_players: int = 1, seed: Optional[int] = None):
         """Reset the environment and set higher error allowance for hard mode."""
         super().reset(num_players=num_players, seed=seed)
         # Set higher error allowance to allow hard mode violations without ending the game
-        self.state.error_allowance = 10  # Allow up to 10 invalid moves before ending the game
+        self.state.error_allowance = HARD_MODE_ERROR_ALLOWANCE  # Allow up to 10 invalid moves before ending the game
+        self.constraints = HardModeConstraints(self.word_length)
+        # Answers from the word list still consistent with every scored guess
+        self.candidates = np.ones(len(self.word_bank.words), dtype=bool)
+        self.remaining_candidates = len(self.word_bank.words)
+        # Feedback codes of the scored guesses, packed for snapshots
+        self.history_codes: Tuple[int, ...] = ()
+        # One (guess, feedback code, violation reason) entry per move; unparseable guesses are None
+        self.move_log: List[Tuple[Optional[str], Optional[int], Optional[str]]] = []
 
     def step(self, action: str) -> Tuple[bool, ta.Info]: # Changed vf.wrappers.text_arena_wrapper.TextArenaInfo to ta.Info
+        metrics = _METRICS
+        if metrics is None:
+            return self._step(action, None)
+        step_start = time.perf_counter_ns()
+        result = self._step(action, metrics)
+        metrics.lap("step", step_start)
+        return result
+
+    def _step(self, action: str, metrics: Optional[EnvMetrics]) -> Tuple[bool, ta.Info]:
+        if metrics is not None:
+            lap_start = time.perf_counter_ns()
         player_id = self.state.current_player_id
-        self.state.add_observation(message=action, observation_type=ta.ObservationType.PLAYER_ACTION)
-        match = re.search(r"\[(\w+)\]", action)
-
-        if match is None:
-            self.state.set_invalid_move(reward=self._get_percentage_completion(), reason=f"You tried submitting a word in the wrong format. Please make sure to use squared brackets.")
-            is_done, info = self.state.step()
-            # Populate info for invalid format
-            info["reason"] = "You tried submitting a word in the wrong format. Please make sure to use squared brackets."
-            info["reward"] = self.state.rewards.get(0, 0.0) if self.state.rewards else 0.0
-            return is_done, info
-
-        word = match.group(1).lower()
+        if not self.compact_history:
+            self.state.add_observation(message=action, observation_type=ta.ObservationType.PLAYER_ACTION)
+        word = extract_guess(action)
+        if metrics is not None:
+            lap_start = metrics.lap("extract", lap_start)
+
+        if word is None:
+            return self._reject(invalid_move_reason("format"))
+
+        word = word.lower()
         if len(word) != self.state.game_state["word_length"]:
-            self.state.set_invalid_move(reward=self._get_percentage_completion(), reason=f"Your word must be exactly {self.state.game_state['word_length']} letters.")
-            is_done, info = self.state.step()
-            # Populate info for wrong length
-            info["reason"] = f"Your word must be exactly {self.state.game_state['word_length']} letters."
-            info["reward"] = self.state.rewards.get(0, 0.0) if self.state.rewards else 0.0
-            return is_done, info
+            return self._reject(invalid_move_reason("length", value=self.state.game_state["word_length"]), word)
 
         # --- Hard Mode Logic ---
-        if self.state.game_state["guess_history"]:
-            # Get feedback from the previous turn
-            last_guess_word, last_feedback = self.state.game_state["guess_history"][-1]
-
-            required_greens = {} # {position: letter}
-            required_yellows = set() # {letter}
-            
-            # Populate required_greens and required_yellows from last feedback
-            for i, (letter, feedback_type) in enumerate(zip(last_guess_word, last_feedback)):
-                if feedback_type == "G":
-                    required_greens[i] = letter
-                elif feedback_type == "Y":
-                    required_yellows.add(letter)
-            
-            # Validate current guess against hard mode rules for greens
-            for pos, req_letter in required_greens.items():
-                if word[pos] != req_letter:
-                    self.state.set_invalid_move(reward=self._get_percentage_completion(), reason=f"Hard Mode violation: Letter '{req_letter.upper()}' must be in position {pos + 1}.")
-                    is_done, info = self.state.step()
-                    # Populate info for hard mode violation
-                    info["reason"] = f"Hard Mode violation: Letter '{req_letter.upper()}' must be in position {pos + 1}."
-                    info["reward"] = self.state.rewards.get(0, 0.0) if self.state.rewards else 0.0
-                    return is_done, info
-
-            # Validate current guess against hard mode rules for yellows
-            for req_letter in required_yellows:
-                if req_letter not in word:
-                    self.state.set_invalid_move(reward=self._get_percentage_completion(), reason=f"Hard Mode violation: Guess must contain letter '{req_letter.upper()}'.")
-                    is_done, info = self.state.step()
-                    # Populate info for hard mode violation
-                    info["reason"] = f"Hard Mode violation: Guess must contain letter '{req_letter.upper()}'."
-                    info["reward"] = self.state.rewards.get(0, 0.0) if self.state.rewards else 0.0
-                    return is_done, info
-
+        reason = self.constraints.violation(word)
+        if metrics is not None:
+            lap_start = metrics.lap("hard_mode", lap_start)
+        if reason is not None:
+            return self._reject(reason, word)
         # --- End Hard Mode Logic ---
 
         # If all hard mode checks pass, or if it's the first turn,
         # proceed with the base WordleEnv's step method
-        is_done, info = super().step(action)
-        
+        history = self.state.game_state["guess_history"]
+        num_scored = len(history)
+        repeated = any(guessed == word for guessed, _ in history)
+        # Pass just the extracted guess, so WordleEnv scores the word hard mode just validated
+        is_done, info = super().step(f"[{word}]")
+        if metrics is not None:
+            lap_start = metrics.lap("wordle_step", lap_start)
+        if len(history) > num_scored:
+            # The guess was scored: fold its feedback into the episode's constraints and candidates
+            self.constraints.update(*history[-1])
+            self._filter_candidates(*history[-1])
+            self.move_log.append((word, self.history_codes[-1], None))
+            if metrics is not None:
+                metrics.lap("candidates", lap_start)
+        elif repeated:
+            self.move_log.append((word, None, f"You have already guessed '{word}' before. Please try a different word."))
+            if metrics is not None:
+                metrics.count_invalid("repeat")
+        else:
+            self.move_log.append((word, None, f"'{word}' is not an English word."))
+            if metrics is not None:
+                metrics.count_invalid("dictionary")
+        info["remaining_candidates"] = self.remaining_candidates
+        return self._finish_step(is_done, info)
+
+    def _finish_step(self, is_done: bool, info: ta.Info) -> Tuple[bool, ta.Info]:
         # Populate step_info with relevant information for testing
         if not is_done:
-            # For normal moves, populate step_info with observation info
-            player_id, observation = self.get_observation()
+            # For normal moves, populate step_info with observation info; the observations stay
+            # pending, since TextArenaEnv.env_response reads them for the model's next turn
+            observation = self.state.observations[self.state.current_player_id]
             if observation:
                 latest_message = observation[-1][1]  # Last message content
                 info["latest_observation"] = {"content": latest_message}
@@ -162,9 +875,121 @@ class HardWordleEnv(WordleEnv):
             if hasattr(self.state, 'game_info') and 0 in self.state.game_info:
                 info["reason"] = self.state.game_info[0].get("reason", "")
         
+        if self.compact_history:
+            self._trim_history()
         return is_done, info
 
-    def ta_to_hf(self) -> Tuple[Dataset, Optional[Dataset]]: # Copy of TextArenaEnv.ta_to_hf
+    def _reject(self, reason: str, word: Optional[str] = None, kind: Optional[str] = None) -> Tuple[bool, ta.Info]:
+        """Record an invalid move and populate info with its reason and reward.
+
+        `kind` is the invalid-move counter for reasons not made by invalid_move_reason.
+        """
+        self.state.set_invalid_move(reward=self._get_percentage_completion(), reason=reason)
+        is_done, info = self.state.step()
+        info["reason"] = reason
+        info["reward"] = self.state.rewards.get(0, 0.0) if self.state.rewards else 0.0
+        info["remaining_candidates"] = self.remaining_candidates
+        self.move_log.append((word, None, reason))
+        if self.compact_history:
+            self._trim_history()
+        metrics = _METRICS
+        if metrics is not None:
+            metrics.count_invalid(kind or _REASON_KINDS.get(reason, "other"))
+        return is_done, info
+
+    def _trim_history(self) -> None:
+        """Keep only the latest pending observation and log entry."""
+        del self.state.observations[0][:-1]
+        del self.state.logs[:-1]
+
+    def _filter_candidates(self, word: str, feedback: Sequence[str]) -> None:
+        """Drop every candidate answer that would not have produced `feedback` for `word`."""
+        remaining = np.flatnonzero(self.candidates)
+        code = feedback_code(feedback)
+        self.history_codes += (code,)
+        keep = remaining[self.word_bank.score(word, remaining) == code]
+        # A new mask rather than an in-place update, so snapshots can share the old one
+        self.candidates = np.zeros(len(self.word_bank.words), dtype=bool)
+        self.candidates[keep] = True
+        self.remaining_candidates = len(keep)
+
+    def snapshot(self) -> GameSnapshot:
+        """Record the current game; pending observations and logs are not included."""
+        return GameSnapshot(
+            codes=self.history_codes,
+            constraints=self.constraints.copy(),
+            candidates=self.candidates,
+            remaining_candidates=self.remaining_candidates,
+            **self._snapshot_state(),
+        )
+
+    def _snapshot_state(self) -> Dict[str, Any]:
+        """The GameSnapshot fields recorded from the textarena state, shared by every board layout."""
+        state = self.state
+        game_state = state.game_state
+        return {
+            "secret": game_state["secret_word"],
+            "words": tuple(word for word, _ in game_state["guess_history"]),
+            "turn": state.turn,
+            "error_count": state.error_count,
+            "done": state.done,
+            "rewards": dict(state.rewards) if state.rewards else state.rewards,
+            "game_info": dict(state.game_info[0]),
+            "rendered_board": game_state.get("rendered_board"),
+            "player_view": game_state.get("player_view"),
+        }
+
+    def restore(self, snapshot: GameSnapshot) -> None:
+        """Put the game back in the state recorded by `snapshot`, with no pending observations."""
+        patterns = feedback_patterns(self.word_length)
+        self._restore_state(snapshot, [(word, list(patterns[code])) for word, code in zip(snapshot.words, snapshot.codes)])
+        self.constraints = snapshot.constraints.copy()
+        self.candidates = snapshot.candidates
+        self.remaining_candidates = snapshot.remaining_candidates
+        self.history_codes = snapshot.codes
+        self.move_log = [(word, code, None) for word, code in zip(snapshot.words, snapshot.codes)]
+
+    def _restore_state(self, snapshot: GameSnapshot, guess_history: List[Tuple[str, Any]]) -> None:
+        """Rebuild the textarena state from `snapshot`, with `guess_history` as the rendered feedback."""
+        state = self.state
+        state.game_state = {
+            "secret_word": snapshot.secret,
+            "guess_history": guess_history,
+            "word_length": self.word_length,
+            "num_guesses": self.num_guesses,
+        }
+        if snapshot.rendered_board is not None:
+            state.game_state["rendered_board"] = snapshot.rendered_board
+            state.game_state["player_view"] = snapshot.player_view
+        state.observations = {0: []}
+        state.logs = []
+        state.step_info = {}
+        state.turn = snapshot.turn
+        state.error_count = snapshot.error_count
+        state.made_invalid_move = False
+        state.done = snapshot.done
+        state.rewards = dict(snapshot.rewards) if snapshot.rewards else snapshot.rewards
+        state.game_info = {0: dict(snapshot.game_info)}
+
+    def fork(self) -> "HardWordleEnv":
+        """Independent copy of this game that shares the word list, dictionary and word bank."""
+        # Shallow copies via __dict__, which is several times cheaper than copy.copy
+        env = object.__new__(type(self))
+        env.__dict__.update(self.__dict__)
+        env.state = object.__new__(type(self.state))
+        env.state.__dict__.update(self.state.__dict__)
+        env.restore(self.snapshot())
+        return env
+
+    def _evaluate_guess(self, guess: str) -> List[str]:
+        feedback = self.word_bank.evaluate(guess, self.state.game_state["secret_word"])
+        if feedback is None:
+            return super()._evaluate_guess(guess)
+        return feedback
+
+    def ta_to_hf(self) -> Tuple["Dataset", Optional["Dataset"]]: # Copy of TextArenaEnv.ta_to_hf
+        from datasets import Dataset, Features, Value
+
         dataset_rows = []
         eval_dataset_rows = []
         
@@ -199,34 +1024,725 @@ class HardWordleEnv(WordleEnv):
             eval_dataset = None
         return dataset, eval_dataset
 
-# New class to override TextArenaEnv's ta_to_hf method
-class HardModeTextArenaEnv(TextArenaEnv):
-    def ta_to_hf(self) -> Tuple[Dataset, Optional[Dataset]]:
-        dataset_rows = []
-        eval_dataset_rows = []
-        
-        # The game passed to TextArenaEnv is an ID, so we need to make it
-        ta_env_instance = ta.make(env_id=self.game)
-        ta_env_instance.reset(num_players=1)
-        _, user_prompt = ta_env_instance.get_observation()
-        words = ta_env_instance.word_list
 
-        random.seed(self.seed)
-        for i in range(self.num_train_examples + self.num_eval_examples):
-            question = user_prompt
-            answer = random.choice(words)
-            if i < self.num_train_examples:
-                dataset_rows.append({"question": question, "answer": answer})
+def _letter_indices(word: str) -> np.ndarray:
+    """Letter indices of a guess (a=0); characters outside a-z become ALPHABET_SIZE."""
+    points = np.frombuffer(word.encode("utf-32-le"), dtype=np.uint32)
+    return np.where((points >= ord("a")) & (points <= ord("z")), points - ord("a"), ALPHABET_SIZE).astype(np.uint8)
+
+
+class MultiBoardHardWordleEnv(HardWordleEnv):
+    """Quordle-style HardWordle: every guess is scored against `num_boards` secrets at once.
+
+    The secrets are stored space-separated in game_state["secret_word"], so code that sets a
+    single secret sets all boards the same way. A board is solved once a guess matches it, and
+    the game is won when every board is solved within `num_guesses`. Hard mode applies per
+    board: a guess must respect every hint of at least one unsolved board, so boards with
+    conflicting greens never leave the player without a legal move. All boards are scored
+    with one scoring-kernel call and share one ConstraintArrays, so K boards cost about as
+    much as one.
+    """
+
+    def __init__(self, num_boards: int = 4, word_length: int = 5, num_guesses: int = 9, hardcore: bool = False, compact_history: bool = False):
+        self.num_boards = num_boards
+        super().__init__(word_length=word_length, num_guesses=num_guesses, hardcore=hardcore, compact_history=compact_history)
+
+    def reset(self, num_players: int = 1, seed: Optional[int] = None):
+        super().reset(num_players=num_players, seed=seed)
+        self.state.game_state["secret_word"] = " ".join(random.sample(self.word_list, self.num_boards))
+        self.state.game_state["num_boards"] = self.num_boards
+        self.solved = np.zeros(self.num_boards, dtype=bool)
+        self.board_constraints = ConstraintArrays(self.num_boards, self.word_length)
+        self.board_candidates = np.ones((self.num_boards, len(self.word_bank.words)), dtype=bool)
+        self.remaining_candidates = [len(self.word_bank.words)] * self.num_boards
+        # Latest feedback code of each board, for percentage completion; -1 before its first guess
+        self.last_codes = np.full(self.num_boards, -1, dtype=np.int64)
+        self._secrets_key = None
+
+    def _rebuild_candidates(self) -> None:
+        word_bank = self.word_bank
+        self.board_candidates = np.ones((self.num_boards, len(word_bank.words)), dtype=bool)
+        for (word, _), codes in zip(self.state.game_state["guess_history"], self.history_codes):
+            word_codes = word_bank.score(word, np.arange(len(word_bank.words)))
+            boards = np.flatnonzero(np.array(codes) >= 0)
+            self.board_candidates[boards] &= word_codes[None, :] == np.array(codes)[boards, None]
+        self.remaining_candidates = self.board_candidates.sum(axis=1).tolist()
+
+    def _generate_player_prompt(self, player_id: int, game_state: Dict[int, Any]) -> str:
+        return (
+            f"You are Playing Wordle on {self.num_boards} boards at once.\n"
+            f"{self.num_boards} secret {game_state['word_length']}-letter words have been chosen, one per board. "
+            f"You have {game_state['num_guesses']} attempts to guess them all.\n"
+            "Each guess is scored against every board that is not solved yet.\n"
+            "For each guess, wrap your word in square brackets (e.g., '[apple]').\nFeedback for each letter will be given as follows:\n"
+            "  - G (green): correct letter in the correct position\n"
+            "  - Y (yellow): letter exists in the word but in the wrong position\n"
+            "  - X (wrong): letter is not in the word\n"
+            "Enter your guess to begin.\n"
+        )
+
+    def _secret_codes(self) -> np.ndarray:
+        """Encoded secrets, re-read whenever game_state["secret_word"] changes."""
+        secret = self.state.game_state["secret_word"]
+        if secret != self._secrets_key:
+            secrets = secret.split()
+            if len(secrets) != self.num_boards:
+                raise ValueError(f"Expected {self.num_boards} space-separated secrets, got {secret!r}.")
+            self._secrets = secrets
+            self._codes = encode_words(secrets)
+            self._secrets_key = secret
+        return self._codes
+
+    def step(self, action: str) -> Tuple[bool, ta.Info]:
+        player_id = self.state.current_player_id
+        if not self.compact_history:
+            self.state.add_observation(message=action, observation_type=ta.ObservationType.PLAYER_ACTION)
+        word = extract_guess(action)
+        if word is None:
+            return self._reject(invalid_move_reason("format"))
+        word = word.lower()
+        if len(word) != self.word_length:
+            return self._reject(invalid_move_reason("length", value=self.word_length), word)
+
+        # --- Hard Mode Logic ---
+        secret_codes = self._secret_codes()
+        boards = np.flatnonzero(~self.solved)
+        letters = np.broadcast_to(_letter_indices(word), (len(boards), self.word_length))
+        reasons = self.board_constraints.violations(boards, letters)
+        if all(reason is not None for reason in reasons):
+            return self._reject(reasons[0], word)
+        # --- End Hard Mode Logic ---
+
+        # The checks WordleEnv.step makes before scoring
+        history = self.state.game_state["guess_history"]
+        if any(guessed == word for guessed, _ in history):
+            return self._reject(f"You have already guessed '{word}' before. Please try a different word.", word, kind="repeat")
+        if not self._check_word(word):
+            return self._reject(f"'{word}' is not an English word.", word, kind="dictionary")
+
+        # One kernel call scores the guess on every open board
+        turn = len(history)
+        codes = score_guesses(letters[:1], secret_codes[boards])[0].astype(np.int64)
+        marks = (codes[:, None] // 3 ** np.arange(self.word_length)) % 3
+        self.board_constraints.update(boards, letters, marks, np.full(len(boards), turn))
+        # and one pass over the word list narrows every board's candidates
+        word_codes = self.word_bank.score(word, np.arange(len(self.word_bank.words)))
+        # A new mask rather than an in-place update, so snapshots can share the old one
+        candidates = self.board_candidates.copy()
+        candidates[boards] &= word_codes[None, :] == codes[:, None]
+        self.board_candidates = candidates
+        self.remaining_candidates = self.board_candidates.sum(axis=1).tolist()
+        self.last_codes[boards] = codes
+        self.solved[boards[codes == 3 ** self.word_length - 1]] = True
+
+        patterns = feedback_patterns(self.word_length)
+        board_codes = np.full(self.num_boards, -1, dtype=np.int64)
+        board_codes[boards] = codes
+        history.append((word, [list(patterns[code]) if code >= 0 else None for code in board_codes]))
+        board_codes = tuple(int(code) for code in board_codes)
+        self.history_codes += (board_codes,)
+        self.move_log.append((word, board_codes, None))
+        self.state.game_state["rendered_board"] = self._render_board()
+        self.state.game_state["player_view"] = self._render_player_view(player_id)
+
+        if self.solved.all():
+            self.state.set_outcome(reward=1, reason=f"Congratulations! You solved all {self.num_boards} boards!")
+        else:
+            self.state.add_observation(
+                message=f"You submitted [{word}].\nFeedback:\n{self._render_player_view(player_id)}\nYou have {self.num_guesses - self.state.turn - 1} guesses left.",
+                observation_type=ta.ObservationType.GAME_MESSAGE,
+            )
+        if len(history) >= self.num_guesses and not self.state.done:
+            pct_complete = self._get_percentage_completion()
+            reason = (f"The turn limit has been reached. You solved {int(self.solved.sum())} of {self.num_boards} boards.\n"
+                      f"The secret words were: **{', '.join(self._secrets)}**.")
+            self.state.set_outcome(reward=pct_complete, reason=reason)
+
+        is_done, info = self.state.step()
+        info["remaining_candidates"] = self.remaining_candidates
+        return self._finish_step(is_done, info)
+
+    def _render_board(self) -> str:
+        history = self.state.game_state["guess_history"]
+        if not history:
+            return "No guesses yet."
+        return "\n\n".join(self._render_guess(word, feedback) for word, feedback in history)
+
+    def _render_player_view(self, player_id: int) -> str:
+        history = self.state.game_state["guess_history"]
+        if not history:
+            return "No guesses yet."
+        return self._render_guess(*history[-1])
+
+    def _render_guess(self, word: str, feedback: Sequence[Optional[Sequence[str]]]) -> str:
+        rows = []
+        for board, marks in enumerate(feedback, start=1):
+            if marks is None:
+                rows.append(f"Board {board}: solved")
             else:
-                eval_dataset_rows.append({"question": question, "answer": answer})
-        
-        features = Features({"question": Value("string"), "answer": Value("string")})
-        dataset = Dataset.from_list(dataset_rows, features=features)
-        if self.num_eval_examples > 0:
-            eval_dataset = Dataset.from_list(eval_dataset_rows, features=features)
+                rows.append(f"Board {board}: {' '.join(word.upper())}\n{' ' * len(f'Board {board}: ')}{' '.join(marks)}")
+        return "\n".join(rows)
+
+    def _get_percentage_completion(self) -> float:
+        """Mean over boards: 1 for a solved board, else the latest guess's greens plus half its yellows."""
+        if not self.state.game_state.get("guess_history"):
+            return 0.0
+        marks = (np.maximum(self.last_codes, 0)[:, None] // 3 ** np.arange(self.word_length)) % 3
+        partial = ((marks == 2).sum(axis=1) + 0.5 * (marks == 1).sum(axis=1)) / self.word_length
+        return float(np.where(self.solved, 1.0, np.where(self.last_codes >= 0, partial, 0.0)).mean())
+
+    def snapshot(self) -> MultiBoardSnapshot:
+        """Record the current game, every board included; pending observations and logs are not."""
+        return MultiBoardSnapshot(
+            solved=self.solved.copy(),
+            last_codes=self.last_codes.copy(),
+            codes=self.history_codes,
+            constraints=self.board_constraints.copy(),
+            candidates=self.board_candidates,
+            remaining_candidates=list(self.remaining_candidates),
+            **self._snapshot_state(),
+        )
+
+    def restore(self, snapshot: MultiBoardSnapshot) -> None:
+        """Put the game back in the state recorded by `snapshot`, with no pending observations."""
+        patterns = feedback_patterns(self.word_length)
+        self._restore_state(snapshot, [
+            (word, [list(patterns[code]) if code >= 0 else None for code in codes])
+            for word, codes in zip(snapshot.words, snapshot.codes)
+        ])
+        self.state.game_state["num_boards"] = self.num_boards
+        self.solved = snapshot.solved.copy()
+        self.last_codes = snapshot.last_codes.copy()
+        self.board_constraints = snapshot.constraints.copy()
+        self.board_candidates = snapshot.candidates
+        self.remaining_candidates = list(snapshot.remaining_candidates)
+        self.history_codes = snapshot.codes
+        self.move_log = [(word, codes, None) for word, codes in zip(snapshot.words, snapshot.codes)]
+
+
+class BatchedHardWordleEnv:
+    """Many HardWordle games stepped together, with per-game state held in NumPy arrays.
+
+    Observations, rewards and done flags match what `HardWordleEnv` gives for the same
+    secrets and actions: the feedback or invalid-move message while a game runs, and the
+    outcome reason once it is over. Actions sent to finished games are ignored.
+    """
+
+    def __init__(self, num_games: int, env: Optional[HardWordleEnv] = None):
+        # The per-game env supplies the word list, dictionary and prompt
+        env = env or HardWordleEnv()
+        self.num_games = num_games
+        self.word_length = env.word_length
+        self.num_guesses = env.num_guesses
+        self.word_bank = env.word_bank
+        self._check_word = env._check_word
+        self.prompt = env._generate_player_prompt(0, {"word_length": self.word_length, "num_guesses": self.num_guesses})
+        # Random secrets come from the entries a lowercased guess can match
+        self._secret_pool = np.fromiter(self.word_bank.index.values(), dtype=np.int64)
+        self._win_code = 3 ** self.word_length - 1
+
+    def reset(self, secrets: Optional[Sequence[str]] = None, seed: Optional[int] = None) -> List[str]:
+        """Start a new game in every slot; returns the initial observations."""
+        n, length = self.num_games, self.word_length
+        if secrets is None:
+            self.secret_ids = np.random.default_rng(seed).choice(self._secret_pool, size=n)
         else:
-            eval_dataset = None
-        return dataset, eval_dataset
+            if len(secrets) != n:
+                raise ValueError(f"Expected {n} secrets, got {len(secrets)}.")
+            unknown = [secret for secret in secrets if secret not in self.word_bank.index]
+            if unknown:
+                raise ValueError(f"Secrets must be lowercase words from the word list: {unknown[:5]}")
+            self.secret_ids = np.array([self.word_bank.index[secret] for secret in secrets], dtype=np.int64)
+        self.secret_codes = self.word_bank.codes[self.secret_ids]
+        self.guess_counts = np.zeros(n, dtype=np.int64)
+        self.error_counts = np.zeros(n, dtype=np.int64)
+        self.done = np.zeros(n, dtype=bool)
+        self.rewards = np.zeros(n, dtype=np.float64)
+        # Scored guesses as code points (exact repeat detection) and the latest feedback marks
+        self.history = np.zeros((n, self.num_guesses, length), dtype=np.uint32)
+        self.last_marks = np.zeros((n, length), dtype=np.uint8)
+        # Hard-mode constraint masks, one row per game
+        self.constraints = ConstraintArrays(n, length)
+        self.observations = [self.prompt] * n
+        return list(self.observations)
+
+    def step(self, actions: Sequence[str]) -> Tuple[List[str], np.ndarray, np.ndarray]:
+        """Apply one action per game; returns (observations, rewards, dones)."""
+        if len(actions) != self.num_games:
+            raise ValueError(f"Expected {self.num_games} actions, got {len(actions)}.")
+        length = self.word_length
+        reasons: Dict[int, str] = {}
+        wordle_rejects = set()  # rejected by the WordleEnv checks, which prefix the final reason
+        words: Dict[int, str] = {}
+        for game in np.flatnonzero(~self.done):
+            word = extract_guess(actions[game])
+            if word is None:
+                reasons[game] = invalid_move_reason("format")
+                continue
+            word = word.lower()
+            if len(word) != length:
+                reasons[game] = invalid_move_reason("length", value=length)
+                continue
+            words[game] = word
+
+        games = np.fromiter(words, dtype=np.int64, count=len(words))
+        points = np.frombuffer("".join(words.values()).encode("utf-32-le"), dtype=np.uint32).reshape(len(games), length)
+        letters = np.where((points >= ord("a")) & (points <= ord("z")), points - ord("a"), ALPHABET_SIZE).astype(np.uint8)
+
+        # --- Hard Mode Logic ---
+        for game, reason in zip(games, self.constraints.violations(games, letters)):
+            if reason is not None:
+                reasons[game] = reason
+        # --- End Hard Mode Logic ---
+
+        # Checks done by WordleEnv.step: repeated guesses, then the dictionary
+        passed = np.array([game not in reasons for game in games], dtype=bool)
+        previous = np.arange(self.num_guesses) < self.guess_counts[games][:, None]
+        repeated = ((self.history[games] == points[:, None, :]).all(axis=2) & previous).any(axis=1)
+        for row in np.flatnonzero(passed):
+            game, word = games[row], words[games[row]]
+            if repeated[row]:
+                reasons[game] = f"You have already guessed '{word}' before. Please try a different word."
+            elif not self._check_word(word):
+                reasons[game] = f"'{word}' is not an English word."
+            else:
+                continue
+            wordle_rejects.add(game)
+            passed[row] = False
+
+        self._score(games[passed], letters[passed], points[passed], [words[game] for game in games[passed]])
+        for game, reason in reasons.items():
+            if self.error_counts[game] < HARD_MODE_ERROR_ALLOWANCE:
+                self.error_counts[game] += 1
+                self.observations[game] = f"You attempted an invalid move. Reason: {reason} Please resubmit a valid move and remember to follow the game rules to avoid penalties."
+            else:
+                self.done[game] = True
+                self.rewards[game] = self._percentage_completion(game)
+                self.observations[game] = f"Invalid Move: {reason}" if game in wordle_rejects else reason
+        return list(self.observations), self.rewards.copy(), self.done.copy()
+
+    def _score(self, games: np.ndarray, letters: np.ndarray, points: np.ndarray, words: List[str]) -> None:
+        """Score valid guesses and fold their feedback into history and constraints."""
+        length = self.word_length
+        codes = score_pairs(letters, self.secret_codes[games])
+        marks = (codes[:, None] // 3 ** np.arange(length)) % 3
+        turns = self.guess_counts[games]
+        self.history[games, turns] = points
+        self.last_marks[games] = marks
+        self.guess_counts[games] += 1
+        self.error_counts[games] = 0
+        self.constraints.update(games, letters, marks, turns)
+
+        for row, game in enumerate(games):
+            if codes[row] == self._win_code:
+                self.done[game] = True
+                self.rewards[game] = 1.0
+                self.observations[game] = "Congratulations! You guessed the word correctly!"
+            elif self.guess_counts[game] >= self.num_guesses:
+                pct_complete = self._percentage_completion(game)
+                secret = self.word_bank.words[self.secret_ids[game]]
+                self.done[game] = True
+                self.rewards[game] = pct_complete
+                self.observations[game] = f"The turn limit has been reached. You didn't guess the word, but your best guess matched {round(pct_complete * 100)}% of the letters in the correct positions.\nThe secret word was: **{secret}**."
+            else:
+                word_row = " ".join(words[row].upper())
+                feedback_row = " ".join(FEEDBACK_MARKS[mark] for mark in marks[row])
+                self.observations[game] = f"You submitted [{words[row]}].\nFeedback:\n{word_row}\n{feedback_row}\nYou have {self.num_guesses - turns[row] - 1} guesses left."
+
+    def _percentage_completion(self, game: int) -> float:
+        """Same as WordleEnv._get_percentage_completion, from the latest scored guess."""
+        if self.guess_counts[game] == 0:
+            return 0.0
+        marks = self.last_marks[game]
+        greens = int((marks == 2).sum())
+        yellows = int((marks == 1).sum()) * 0.5
+        return (greens + yellows) / self.word_length
+
+
+### difficulty index
+SAMPLING_MODES = ("uniform", "stratified", "curriculum")
+
+
+def pattern_cluster_sizes(codes: np.ndarray) -> np.ndarray:
+    """For each word, the most words that share all of its letters but one position ("_ight" traps)."""
+    num_words, word_length = codes.shape
+    sizes = np.ones(num_words, dtype=np.int64)
+    weights = (ALPHABET_SIZE + 1) ** np.arange(word_length, dtype=np.int64)
+    for pos in range(word_length):
+        masked = codes.astype(np.int64)
+        masked[:, pos] = ALPHABET_SIZE  # a wildcard no letter encodes to
+        _, inverse, counts = np.unique(masked @ weights, return_inverse=True, return_counts=True)
+        sizes = np.maximum(sizes, counts[inverse])
+    return sizes
+
+
+def letter_frequencies(codes: np.ndarray) -> np.ndarray:
+    """Mean share of the word list having each of a word's letters in the same position."""
+    num_words, word_length = codes.shape
+    frequency = np.zeros(num_words)
+    for pos in range(word_length):
+        column = codes[:, pos].astype(np.int64)
+        frequency += np.bincount(column, minlength=ALPHABET_SIZE + 1)[column] / num_words
+    return frequency / word_length
+
+
+class DifficultyIndex:
+    """Per-word difficulty of a word list, saved next to the feedback table as one .npz file.
+
+    `solver_depth` is the number of guesses HardModeSolver needs for the word (one more than
+    the guess limit if it fails), `cluster_size` is from pattern_cluster_sizes and
+    `letter_frequency` from letter_frequencies. Arrays follow WordBank.words order, and words
+    are looked up through a dict, so sampling never recomputes anything. `digest` hashes the
+    arrays as saved, so datasets sampled from an index can be told apart after a rebuild.
+    Build it with hard_wordle_solver.build_difficulty_index().
+    """
+
+    def __init__(self, words: Sequence[str], solver_depth: np.ndarray, cluster_size: np.ndarray, letter_frequency: np.ndarray):
+        self.words = list(words)
+        self.solver_depth = solver_depth
+        self.cluster_size = cluster_size
+        self.letter_frequency = letter_frequency
+        self.position = {word: i for i, word in enumerate(self.words)}
+        key = hashlib.sha1()
+        for array, dtype in ((solver_depth, np.uint8), (cluster_size, np.uint16), (letter_frequency, np.float32)):
+            key.update(np.ascontiguousarray(array, dtype=dtype).tobytes())
+        self.digest = key.hexdigest()[:16]
+
+    @staticmethod
+    def path(word_bank: WordBank, directory: Optional[str] = None) -> str:
+        directory = directory or feedback_table_dir()
+        return os.path.join(directory, f"hard_wordle_difficulty_{word_bank.word_length}_{word_bank.digest}.npz")
+
+    @classmethod
+    def load(cls, word_bank: WordBank, directory: Optional[str] = None) -> Optional["DifficultyIndex"]:
+        """The saved index for this word list, or None if it was never built."""
+        try:
+            path = cls.path(word_bank, directory)
+        except LookupError:
+            return None
+        if not os.path.exists(path):
+            return None
+        with np.load(path) as data:
+            return cls(word_bank.words, data["solver_depth"], data["cluster_size"], data["letter_frequency"])
+
+    def save(self, path: str) -> None:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp.npz"
+        np.savez(
+            tmp_path,
+            solver_depth=self.solver_depth.astype(np.uint8),
+            cluster_size=self.cluster_size.astype(np.uint16),
+            letter_frequency=self.letter_frequency.astype(np.float32),
+        )
+        os.replace(tmp_path, path)
+
+    def depth(self, word: str) -> int:
+        return int(self.solver_depth[self.position[word]])
+
+    def order_key(self, word: str) -> Tuple[int, int, float]:
+        """Sort key from easiest to hardest: solver depth, then cluster size, then rarer letters."""
+        i = self.position[word]
+        return int(self.solver_depth[i]), int(self.cluster_size[i]), -float(self.letter_frequency[i])
+
+
+### dataset generation
+def sample_answers(words: Sequence[str], seed: int) -> Iterator[str]:
+    """Endless stream of secret words, in the order ta_to_hf has always drawn them for `seed`."""
+    rng = random.Random(seed)  # same sequence as random.seed(seed) followed by random.choice
+    while True:
+        yield rng.choice(words)
+
+
+def difficulty_answers(words: Sequence[str], seed: int, index: DifficultyIndex, sampling: str = "uniform",
+                       difficulty_range: Optional[Sequence[int]] = None) -> Iterator[str]:
+    """Endless stream of secret words drawn with the index's solver depths.
+
+    "uniform" and "curriculum" follow sample_answers (curriculum order is applied to the drawn
+    training split by ta_to_hf); "stratified" cycles through the solver depths and draws a word
+    from each in turn. `difficulty_range` keeps only words whose depth is within [low, high].
+    """
+    low, high = difficulty_range if difficulty_range is not None else (0, np.iinfo(np.uint8).max)
+    depths = np.array([index.depth(word) for word in words])
+    in_range = (depths >= low) & (depths <= high)
+    if not in_range.any():
+        raise ValueError(f"No words have a solver depth in {list(difficulty_range)}.")
+    if sampling != "stratified":
+        yield from (word for word in sample_answers(words, seed) if low <= index.depth(word) <= high)
+        return
+    strata = [np.flatnonzero(in_range & (depths == depth)) for depth in np.unique(depths[in_range])]
+    rng = random.Random(seed)
+    while True:
+        for stratum in strata:
+            yield words[rng.choice(stratum)]
+
+
+def _streaming_rows(question: str, words: Tuple[str, ...], seed: int, start: int, stop: int,
+                    index: Optional[DifficultyIndex] = None, sampling: str = "uniform",
+                    difficulty_range: Optional[Tuple[int, int]] = None) -> Iterator[Dict[str, str]]:
+    # `words` is a tuple because datasets would shard a list gen_kwarg; every row yields the same question object
+    answers = sample_answers(words, seed) if index is None else difficulty_answers(words, seed, index, sampling, difficulty_range)
+    for answer in itertools.islice(answers, start, stop):
+        yield {"question": question, "answer": answer}
+
+
+### results
+class RunningSummary:
+    """Count, mean, standard deviation, min and max of a stream of values (Welford's update)."""
+
+    __slots__ = ("count", "mean", "m2", "min", "max")
+
+    def __init__(self):
+        self.count = 0
+        self.mean = self.m2 = 0.0
+        self.min = float("inf")
+        self.max = float("-inf")
+
+    def add(self, value: float) -> None:
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def to_dict(self) -> Dict[str, float]:
+        std = (self.m2 / self.count) ** 0.5 if self.count else 0.0
+        return {"count": self.count, "mean": self.mean, "std": std, "min": self.min, "max": self.max}
+
+
+class RolloutWriter:
+    """Appends scored rollouts to a JSONL or Parquet file as they finish.
+
+    Rows hold the example index, rollout id, answer, reward, one column per metric and the
+    completion (a JSON string in Parquet). JSONL rows are flushed one by one; Parquet rows are
+    buffered column-wise and written as a row group every `row_group_size` rollouts. Either way
+    memory stays flat however many rollouts are written. Reward and metric summaries are updated
+    per row and saved next to the results as `<path>.summary.json` on close.
+    """
+
+    def __init__(self, path: str, meta: Optional[Dict[str, Any]] = None, row_group_size: int = 256):
+        if not path.endswith((".jsonl", ".parquet")):
+            raise ValueError(f"Results path must end in .jsonl or .parquet: {path!r}")
+        self.path = path
+        self.meta = meta or {}
+        self.row_group_size = row_group_size
+        self.summaries: Dict[str, RunningSummary] = {}
+        self._columns: Dict[str, List[Any]] = {}
+        self._parquet_writer = None
+        self._file = open(path, "w") if path.endswith(".jsonl") else None
+
+    def write(self, row: Dict[str, Any]) -> None:
+        for name in ("reward", *row.get("metrics", {})):
+            value = row["reward"] if name == "reward" else row["metrics"][name]
+            summary = self.summaries.get(name)
+            if summary is None:
+                summary = self.summaries[name] = RunningSummary()
+            summary.add(value)
+        flat = {k: v for k, v in row.items() if k != "metrics"}
+        flat.update(row.get("metrics", {}))
+        if self._file is not None:
+            self._file.write(json.dumps(flat, default=str) + "\n")
+            self._file.flush()
+            return
+        flat["completion"] = json.dumps(flat["completion"], default=str)
+        for name, value in flat.items():
+            self._columns.setdefault(name, []).append(value)
+        if len(self._columns["completion"]) >= self.row_group_size:
+            self._flush_row_group()
+
+    def _flush_row_group(self) -> None:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        if not self._columns:
+            return
+        table = pa.table(self._columns)
+        if self._parquet_writer is None:
+            self._parquet_writer = pq.ParquetWriter(self.path, table.schema)
+        self._parquet_writer.write_table(table)
+        self._columns = {}
+
+    def summary(self) -> Dict[str, Any]:
+        return {"meta": self.meta, **{name: summary.to_dict() for name, summary in self.summaries.items()}}
+
+    def close(self) -> Dict[str, Any]:
+        """Flush the remaining rows and write the summary file; returns the summary."""
+        if self._file is not None:
+            self._file.close()
+        else:
+            self._flush_row_group()
+            if self._parquet_writer is not None:
+                self._parquet_writer.close()
+        summary = self.summary()
+        with open(self.path + ".summary.json", "w") as f:
+            json.dump(summary, f, indent=2, default=str)
+        return summary
+
+    def __enter__(self) -> "RolloutWriter":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+def load_results(path: str) -> "Dataset":
+    """Memory-mapped Dataset of the rollouts written by RolloutWriter."""
+    from datasets import Dataset
+
+    if path.endswith(".parquet"):
+        return Dataset.from_parquet(path)
+    return Dataset.from_json(path)
+
+
+class EvalLedger:
+    """Append-only JSONL record of finished rollouts, so an interrupted evaluation can resume.
+
+    Each line holds one scored rollout under a key derived from (example index, answer,
+    rollout id, model, sampling args). Lines are flushed and fsynced as rollouts finish;
+    a line cut short by a crash is ignored on the next load, and a key recorded twice keeps
+    its latest rollout.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.rows: Dict[str, Dict[str, Any]] = {}
+        complete = True
+        if os.path.exists(path):
+            with open(path) as f:
+                for line in f:
+                    complete = line.endswith("\n")
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    self.rows[entry.pop("key")] = entry
+        self._file = open(path, "a")
+        if not complete:
+            # Start after the torn line rather than appending to it
+            self._file.write("\n")
+
+    @staticmethod
+    def key(example_id: int, answer: str, rollout_id: int, model: str, sampling_args: Optional[Dict[str, Any]]) -> str:
+        payload = json.dumps([example_id, answer, rollout_id, model, sampling_args or {}], sort_keys=True, default=str)
+        return hashlib.sha1(payload.encode()).hexdigest()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        return self.rows.get(key)
+
+    def record(self, key: str, row: Dict[str, Any]) -> None:
+        self._file.write(json.dumps({"key": key, **row}, default=str) + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self.rows[key] = row
+
+    def close(self) -> None:
+        self._file.close()
+
+
+### response cache
+class ResponseCache:
+    """SQLite-backed cache of chat completions, keyed by a hash of model, sampling args and messages.
+
+    Every game in an eval starts from the same system and user prompt, so at temperature 0
+    the opening turns repeat across seeds. Only requests with temperature 0 are cached unless
+    `deterministic_only=False`. Identical requests that are in flight at the same time share
+    one model call.
+    """
+
+    def __init__(self, path: str, deterministic_only: bool = True):
+        self.path = path
+        self.deterministic_only = deterministic_only
+        self.hits = 0
+        self.misses = 0
+        self._pending: Dict[str, asyncio.Future] = {}
+        self._db = sqlite3.connect(path)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, response TEXT NOT NULL)")
+        self._db.commit()
+
+    def accepts(self, sampling_args: Optional[Dict[str, Any]]) -> bool:
+        return not self.deterministic_only or (sampling_args or {}).get("temperature") == 0
+
+    @staticmethod
+    def key(model: str, sampling_args: Optional[Dict[str, Any]], messages: Sequence[Dict[str, Any]]) -> str:
+        """Hash of the request, with sampling args in the form the chat client sends them.
+
+        The chat client renames `max_tokens` to `max_completion_tokens` in the shared
+        sampling_args dict, so both spellings map to the same key; `n` (always 1 here) and an
+        empty `extra_body` are dropped.
+        """
+        args = {k: v for k, v in (sampling_args or {}).items() if v is not None and k != "n"}
+        if "max_tokens" in args:
+            args["max_completion_tokens"] = args.pop("max_tokens")
+        if not args.get("extra_body", True):
+            del args["extra_body"]
+        payload = json.dumps([model, args, messages], sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    async def get_or_fetch(self, key: str, fetch) -> "ChatCompletion":
+        """Cached response for `key`, else the result of awaiting `fetch()`, which is then stored."""
+        row = self._db.execute("SELECT response FROM responses WHERE key = ?", (key,)).fetchone()
+        if row is not None:
+            from openai.types.chat import ChatCompletion
+
+            self.hits += 1
+            return ChatCompletion.model_validate_json(row[0])
+        pending = self._pending.get(key)
+        if pending is not None:
+            self.hits += 1
+            return await asyncio.shield(pending)
+
+        self.misses += 1
+        future = self._pending[key] = asyncio.get_running_loop().create_future()
+        try:
+            response = await fetch()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # mark retrieved when nobody else was waiting
+            raise
+        finally:
+            del self._pending[key]
+        future.set_result(response)
+        self._db.execute("INSERT OR REPLACE INTO responses VALUES (?, ?)", (key, response.model_dump_json()))
+        self._db.commit()
+        return response
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "hit_rate": self.hits / total if total else 0.0}
+
+    def close(self) -> None:
+        self._db.close()
+
+
+### async evaluation
+def make_async_client(
+    base_url: Optional[str] = None,
+    api_key: Optional[str] = None,
+    max_in_flight: int = 64,
+    request_timeout: float = 120.0,
+    max_retries: int = 3,
+) -> "AsyncOpenAI":
+    """AsyncOpenAI client whose connection pool holds `max_in_flight` keep-alive connections.
+
+    Each request times out after `request_timeout` seconds and is retried up to
+    `max_retries` times with backoff on timeouts, rate limits and server errors.
+    """
+    import httpx
+    from openai import AsyncOpenAI
+
+    limits = httpx.Limits(max_connections=max_in_flight, max_keepalive_connections=max_in_flight)
+    return AsyncOpenAI(
+        base_url=base_url,
+        api_key=api_key,
+        timeout=request_timeout,
+        max_retries=max_retries,
+        http_client=httpx.AsyncClient(limits=limits, timeout=request_timeout),
+    )
 
 
 # Register HardWordleEnv with textarena
@@ -240,12 +1756,65 @@ register_with_versions(
     num_guesses=6,
 )
 
+# Other word lengths get one extra guess per extra letter, like the 5-letter/6-guess default
+HARD_WORDLE_LENGTH_IDS = {length: f"{HARD_WORDLE_ENV_ID}-len{length}" for length in (4, 6, 7)}
+for length, env_id in HARD_WORDLE_LENGTH_IDS.items():
+    register_with_versions(
+        id=env_id,
+        entry_point=HardWordleEnv,
+        wrappers={"default": [], "-train": []},
+        hardcore=True,
+        word_length=length,
+        num_guesses=length + 1,
+    )
+
+# Quordle: four 5-letter boards share nine guesses
+QUORDLE_ENV_ID = f"{HARD_WORDLE_ENV_ID}-quordle"
+register_with_versions(
+    id=QUORDLE_ENV_ID,
+    entry_point=MultiBoardHardWordleEnv,
+    wrappers={"default": [], "-train": []},
+    hardcore=True,
+    num_boards=4,
+    word_length=5,
+    num_guesses=9,
+)
+
+### lazy attributes
+# Subclasses of verifiers types live in hard_wordle_verifiers, imported on first access
+_VERIFIERS_ATTRIBUTES = ("HardModeTextArenaEnv", "HardWordleRubric")
+
+
+def __getattr__(name: str):
+    if name in _VERIFIERS_ATTRIBUTES:
+        import hard_wordle_verifiers
+        return getattr(hard_wordle_verifiers, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
 ### environment loader
 def load_environment(
     num_train_examples: int = 2000,
     num_eval_examples: int = 20,
     use_think: bool = True,
+    streaming: bool = False,
+    scoring_workers: int = 0,
+    ledger_path: Optional[str] = None,
+    response_cache_path: Optional[str] = None,
+    sampling: str = "uniform",
+    difficulty_range: Optional[Sequence[int]] = None,
+    word_length: int = 5,
 ):
+    if word_length == 5:
+        game = HARD_WORDLE_ENV_ID
+    elif word_length in HARD_WORDLE_LENGTH_IDS:
+        game = HARD_WORDLE_LENGTH_IDS[word_length]
+    else:
+        raise ValueError(f"word_length must be one of {sorted([5, *HARD_WORDLE_LENGTH_IDS])}, got {word_length}.")
+
+    import verifiers as vf
+    from hard_wordle_verifiers import HardModeTextArenaEnv, HardWordleRubric
+
     if use_think:
         system_prompt = THINK_GUESS_SYSTEM_PROMPT
         parser = vf.XMLParser(fields=["think", "guess"], answer_field="guess")
@@ -253,21 +1822,27 @@ def load_environment(
         system_prompt = NOTHINK_GUESS_SYSTEM_PROMPT
         parser = vf.XMLParser(fields=["guess"], answer_field="guess")
 
-    rubric = vf.Rubric(parser=parser)
+    # scoring_workers > 1 scores large rollout batches in a process pool
+    rubric = HardWordleRubric(parser=parser, num_workers=scoring_workers)
     rubric.add_reward_func(check_answer_reward_func)
     rubric.add_reward_func(partial_credit_reward_func)
     rubric.add_reward_func(count_turns_reward_func)
-    rubric.add_reward_func(parser.get_format_reward_func(), weight=0.2)
+    rubric.add_reward_func(format_reward_func, weight=0.2)
 
     # Instantiate HardModeTextArenaEnv instead of TextArenaEnv
     vf_env = HardModeTextArenaEnv(
-        game=HARD_WORDLE_ENV_ID, # Pass the registered ID here
+        game=game, # Registered ID of the HardWordle variant for word_length
         num_train_examples=num_train_examples,
         num_eval_examples=num_eval_examples,
         system_prompt=system_prompt,
         parser=parser,
         rubric=rubric,
         feedback_fn=wordle_feedback_fn,
+        streaming=streaming, # Draw training rows on demand instead of materializing them
+        ledger_path=ledger_path, # Resume evaluations from the rollouts recorded here
+        response_cache_path=response_cache_path, # SQLite cache for temperature-0 model responses
+        sampling=sampling, # "uniform", "stratified" or "curriculum" over the difficulty index
+        difficulty_range=difficulty_range, # [low, high] hard-mode solver depth of the answers
         # dataset and eval_dataset are now handled by HardModeTextArenaEnv.ta_to_hf()
     )
     return vf_env
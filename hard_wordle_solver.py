@@ -0,0 +1,281 @@
+"""Reference player for HardWordle-v0 that only makes guesses hard mode allows.
+
+Each turn it plays the allowed guess whose feedback splits the remaining candidate
+answers into the most even partition (maximum expected information). The first two
+turns come from an opening book, precomputed once per word list like the feedback table:
+
+    uv run python -c "import hard_wordle_solver; print(hard_wordle_solver.build_opening_book())"
+
+The same solver rates every word's difficulty for load_environment's stratified and
+curriculum sampling (build_difficulty_index), and plays the eval split to write baseline
+results rows next to a model's (write_baseline).
+"""
+import json
+import os
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from hard_wordle import (
+    ALPHABET_SIZE,
+    DifficultyIndex,
+    HardModeConstraints,
+    HardWordleEnv,
+    RolloutWriter,
+    WordBank,
+    feedback_code,
+    feedback_patterns,
+    feedback_table_dir,
+    letter_frequencies,
+    pattern_cluster_sizes,
+    score_completions,
+)
+
+# Upper bound on guess x candidate codes scored at once, to keep memory flat on the first turn
+MAX_CHUNK_PAIRS = 1 << 22
+
+
+def partition_information(codes: np.ndarray, num_patterns: int) -> np.ndarray:
+    """Expected information (in nats) of each guess's feedback partition.
+
+    `codes` is (G, C): feedback codes of G guesses against the C candidate answers. All G
+    partitions are counted with a single bincount by offsetting each row into its own range.
+    """
+    num_guesses, num_candidates = codes.shape
+    offsets = np.arange(num_guesses, dtype=np.int64)[:, None] * num_patterns
+    counts = np.bincount((codes + offsets).ravel(), minlength=num_guesses * num_patterns)
+    counts = counts.reshape(num_guesses, num_patterns)
+    # H = log C - sum(n log n) / C over the partition's buckets
+    return np.log(num_candidates) - (counts * np.log(np.maximum(counts, 1))).sum(axis=1) / num_candidates
+
+
+class OpeningBook:
+    """Best first guess, and the best second guess for each feedback code of the first."""
+
+    def __init__(self, first: str, second: Dict[int, str]):
+        self.first = first
+        self.second = second
+
+    @staticmethod
+    def path(word_bank: WordBank, directory: Optional[str] = None) -> str:
+        directory = directory or feedback_table_dir()
+        return os.path.join(directory, f"hard_wordle_opening_book_{word_bank.word_length}_{word_bank.digest}.json")
+
+    @classmethod
+    def load(cls, word_bank: WordBank, directory: Optional[str] = None) -> Optional["OpeningBook"]:
+        """The saved book for this word list, or None if it was never built."""
+        try:
+            path = cls.path(word_bank, directory)
+        except LookupError:
+            return None
+        if not os.path.exists(path):
+            return None
+        with open(path) as f:
+            data = json.load(f)
+        return cls(data["first"], {int(code): word for code, word in data["second"].items()})
+
+    def save(self, path: str) -> None:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"first": self.first, "second": {str(code): word for code, word in sorted(self.second.items())}}, f)
+        os.replace(tmp_path, path)
+
+
+class HardModeSolver:
+    """Maximum-information Wordle player restricted to hard-mode-legal guesses."""
+
+    def __init__(self, word_bank: WordBank, playable: Optional[np.ndarray] = None, opening_book: Optional[OpeningBook] = None):
+        self.word_bank = word_bank
+        self.num_patterns = 3 ** word_bank.word_length
+        if playable is None:
+            # Only lowercase words can be looked up and scored
+            playable = np.zeros(len(word_bank.words), dtype=bool)
+            playable[list(word_bank.index.values())] = True
+        self.playable = playable
+        self.letter_counts = (word_bank.codes[:, :, None] == np.arange(ALPHABET_SIZE)).sum(axis=1)
+        self.opening_book = opening_book
+
+    @classmethod
+    def for_env(cls, env: HardWordleEnv) -> "HardModeSolver":
+        """Solver whose guesses all pass `env`'s dictionary check, with the saved opening book if any."""
+        word_bank = env.word_bank
+        playable = np.zeros(len(word_bank.words), dtype=bool)
+        for word, i in word_bank.index.items():
+            playable[i] = env._check_word(word)
+        return cls(word_bank, playable, OpeningBook.load(word_bank))
+
+    def allowed(self, constraints: HardModeConstraints, guess_history: Sequence[Tuple[str, Sequence[str]]]) -> np.ndarray:
+        """Mask of playable words that satisfy every hard-mode constraint and were not guessed yet."""
+        allowed = self.playable.copy()
+        codes = self.word_bank.codes
+        for pos, letter in enumerate(constraints.greens):
+            if letter is not None:
+                allowed &= codes[:, pos] == ord(letter) - ord("a")
+        for letter, count in constraints.min_counts.items():
+            allowed &= self.letter_counts[:, ord(letter) - ord("a")] >= count
+        for word, _ in guess_history:
+            if word in self.word_bank.index:
+                allowed[self.word_bank.index[word]] = False
+        return allowed
+
+    def best_guess(self, guess_ids: np.ndarray, candidate_ids: np.ndarray) -> int:
+        """Id of the guess with the most informative partition; ties go to possible answers."""
+        if len(candidate_ids) <= 2:
+            return int(candidate_ids[0])
+        chunk = max(1, MAX_CHUNK_PAIRS // len(candidate_ids))
+        information = np.concatenate([
+            partition_information(self.word_bank.score_ids(guess_ids[start:start + chunk], candidate_ids), self.num_patterns)
+            for start in range(0, len(guess_ids), chunk)
+        ])
+        top = np.flatnonzero(information >= information.max() - 1e-12)
+        is_candidate = np.isin(guess_ids[top], candidate_ids)
+        return int(guess_ids[top[is_candidate.argmax()]])
+
+    def next_guess(self, constraints: HardModeConstraints, candidates: np.ndarray, guess_history: Sequence[Tuple[str, Sequence[str]]]) -> str:
+        """Next word to play, given the env's constraints, candidate mask and guess history."""
+        book = self.opening_book
+        if book is not None and not guess_history:
+            return book.first
+        if book is not None and len(guess_history) == 1 and guess_history[0][0] == book.first:
+            second = book.second.get(feedback_code(guess_history[0][1]))
+            if second is not None:
+                return second
+
+        allowed = self.allowed(constraints, guess_history)
+        candidate_ids = np.flatnonzero(candidates & allowed)
+        guess_ids = np.flatnonzero(allowed)
+        if len(candidate_ids) == 0:
+            # The answer is outside the playable words; keep making legal guesses
+            return self.word_bank.words[guess_ids[0]]
+        return self.word_bank.words[self.best_guess(guess_ids, candidate_ids)]
+
+    def play(self, env: HardWordleEnv) -> Tuple[Dict, int]:
+        """Play the env's current game to the end; returns the final step info and number of moves."""
+        is_done, info, moves = False, {}, 0
+        while not is_done:
+            guess = self.next_guess(env.constraints, env.candidates, env.state.game_state["guess_history"])
+            is_done, info = env.step(f"[{guess}]")
+            moves += 1
+        return info, moves
+
+    def depth(self, secret_id: int, num_guesses: int = 6) -> int:
+        """Guesses needed to find word `secret_id` (num_guesses + 1 if it is not found), without an env."""
+        word_bank = self.word_bank
+        patterns = feedback_patterns(word_bank.word_length)
+        win_code = self.num_patterns - 1
+        constraints = HardModeConstraints(word_bank.word_length)
+        candidates = np.ones(len(word_bank.words), dtype=bool)
+        history: List[Tuple[str, Sequence[str]]] = []
+        for turn in range(1, num_guesses + 1):
+            guess = self.next_guess(constraints, candidates, history)
+            code = int(word_bank.score(guess, np.array([secret_id]))[0])
+            if code == win_code:
+                return turn
+            constraints.update(guess, patterns[code])
+            history.append((guess, patterns[code]))
+            remaining = np.flatnonzero(candidates)
+            candidates = np.zeros_like(candidates)
+            candidates[remaining[word_bank.score(guess, remaining) == code]] = True
+        return num_guesses + 1
+
+    def solve(self, env: HardWordleEnv, secret: str) -> Tuple[float, int]:
+        """Reset `env` with `secret` and play it; returns (reward, number of scored guesses)."""
+        env.reset(num_players=1)
+        env.state.game_state["secret_word"] = secret
+        info, _ = self.play(env)
+        return info.get("reward", 0.0), len(env.state.game_state["guess_history"])
+
+
+def build_opening_book(solver: Optional[HardModeSolver] = None, directory: Optional[str] = None) -> str:
+    """Precompute the first two turns for the solver's word list and save them; returns the path."""
+    if solver is None:
+        solver = HardModeSolver.for_env(HardWordleEnv())
+    word_bank = solver.word_bank
+    patterns = feedback_patterns(word_bank.word_length)
+    no_history: List[Tuple[str, Sequence[str]]] = []
+    allowed = solver.allowed(HardModeConstraints(word_bank.word_length), no_history)
+    answer_ids = np.flatnonzero(allowed)
+    first_id = solver.best_guess(answer_ids, answer_ids)
+    first = word_bank.words[first_id]
+
+    second = {}
+    first_codes = word_bank.score_ids(np.array([first_id]), answer_ids)[0]
+    for code in np.unique(first_codes):
+        if patterns[code] == ("G",) * word_bank.word_length:
+            continue
+        constraints = HardModeConstraints(word_bank.word_length)
+        constraints.update(first, patterns[code])
+        history = [(first, patterns[code])]
+        guess_ids = np.flatnonzero(solver.allowed(constraints, history))
+        candidate_ids = answer_ids[first_codes == code]
+        candidate_ids = candidate_ids[np.isin(candidate_ids, guess_ids)]
+        if len(candidate_ids):
+            second[int(code)] = word_bank.words[solver.best_guess(guess_ids, candidate_ids)]
+
+    path = OpeningBook.path(word_bank, directory)
+    OpeningBook(first, second).save(path)
+    solver.opening_book = OpeningBook(first, second)
+    return path
+
+
+def build_difficulty_index(solver: Optional[HardModeSolver] = None, directory: Optional[str] = None, num_guesses: int = 6) -> str:
+    """Solve every word of the solver's word list and save its DifficultyIndex; returns the path.
+
+    Builds the opening book first when there is none, since it answers the first two turns of every game.
+    """
+    if solver is None:
+        solver = HardModeSolver.for_env(HardWordleEnv())
+    if solver.opening_book is None:
+        build_opening_book(solver, directory)
+    word_bank = solver.word_bank
+    depths = np.array([solver.depth(i, num_guesses) for i in range(len(word_bank.words))])
+    index = DifficultyIndex(word_bank.words, depths, pattern_cluster_sizes(word_bank.codes), letter_frequencies(word_bank.codes))
+    path = DifficultyIndex.path(word_bank, directory)
+    index.save(path)
+    return path
+
+
+def write_baseline(vf_env, results_path: str, solver: Optional[HardModeSolver] = None, num_examples: int = -1) -> Dict[str, Any]:
+    """Play every answer of `vf_env`'s eval split with the solver and write the rollouts to `results_path`.
+
+    Each game is turned into the chat completion a model would have produced (the env's parser
+    format, its feedback_fn on every observation) and scored by the env's rubric, so the rows
+    line up with those of evaluate/evaluate_async(results_path=...) by example_id. Returns the
+    RolloutWriter summary.
+    """
+    env = vf_env.ta_env
+    if solver is None:
+        solver = HardModeSolver.for_env(env)
+    parser = vf_env.parser
+    inputs = vf_env._eval_inputs(num_examples, 1)
+    completions = []
+    for answer in inputs["answer"]:
+        env.reset(num_players=1)
+        env.state.game_state["secret_word"] = answer
+        completion: List[Dict[str, str]] = []
+        is_done = False
+        while not is_done:
+            guess = f"[{solver.next_guess(env.constraints, env.candidates, env.state.game_state['guess_history'])}]"
+            values = {field: "Reference hard-mode solver." for field in parser.get_fields()}
+            values[parser.answer_field] = guess
+            completion.append({"role": "assistant", "content": parser.format(**values)})
+            is_done, _ = env.step(guess)
+            _, observation = env.get_observation()
+            completion.append({"role": "user", "content": str(vf_env.feedback_fn(observation))})
+        completions.append(completion)
+
+    rubric = vf_env.rubric
+    names = rubric.get_reward_func_names()
+    scores = score_completions(parser, rubric, completions, inputs["answer"])
+    with RolloutWriter(results_path, meta={"model": "hard_mode_solver", "game": vf_env.game}) as writer:
+        for info, answer, completion, row_scores in zip(inputs["info"], inputs["answer"], completions, scores):
+            writer.write({
+                "example_id": info["example_id"],
+                "rollout_id": info["rollout_id"],
+                "answer": answer,
+                "reward": float(row_scores[0]),
+                "metrics": {name: float(score) for name, score in zip(names, row_scores[1:])},
+                "completion": completion,
+            })
+    return writer.summary()
@@ -0,0 +1,535 @@
+"""verifiers integration for HardWordle: the multi-turn env, its rubric and the dataset cache.
+
+These depend on verifiers, datasets and openai, which take seconds to import, so they live
+apart from hard_wordle: the game, scoring kernels and reward functions import without them,
+and hard_wordle.load_environment imports this module on first use.
+"""
+import asyncio
+import copy
+import hashlib
+import itertools
+import json
+import os
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import nltk
+import numpy as np
+import textarena as ta
+import verifiers as vf
+from datasets import Dataset, Features, IterableDataset, Value, load_from_disk
+from openai import AsyncOpenAI
+from verifiers.envs.textarena_env import TextArenaEnv
+
+import hard_wordle
+from hard_wordle import (
+    PARALLEL_SCORING_MIN_ROLLOUTS,
+    SAMPLING_MODES,
+    DifficultyIndex,
+    EvalLedger,
+    ResponseCache,
+    RolloutWriter,
+    _compact_completion,
+    _streaming_rows,
+    completion_analyses,
+    difficulty_answers,
+    feedback_table_dir,
+    get_word_bank,
+    sample_answers,
+    score_completions,
+)
+
+
+### dataset cache
+def dataset_cache_path(game: str, seed: int, num_train_examples: int, num_eval_examples: int, prompt: str, words: Sequence[str],
+                       sampling_spec: str = "") -> Optional[str]:
+    """Content-addressed directory for the datasets generated by `ta_to_hf`, or None without a data dir.
+
+    `sampling_spec` describes non-uniform answer sampling; it is empty for the default.
+    """
+    key = hashlib.sha1()
+    parts = (game, str(seed), str(num_train_examples), str(num_eval_examples), prompt, "\n".join(words))
+    if sampling_spec:
+        parts += (sampling_spec,)
+    for part in parts:
+        key.update(part.encode())
+        key.update(b"\0")
+    try:
+        directory = feedback_table_dir()
+    except LookupError:
+        return None
+    return os.path.join(directory, f"hard_wordle_dataset_{key.hexdigest()[:16]}")
+
+
+def load_cached_datasets(path: str) -> Optional[Tuple[Dataset, Optional[Dataset]]]:
+    """Memory-map the cached train/eval Arrow files, or return None if there is no complete cache."""
+    if not os.path.isdir(os.path.join(path, "train")):
+        return None
+    dataset = load_from_disk(os.path.join(path, "train"))
+    eval_path = os.path.join(path, "eval")
+    eval_dataset = load_from_disk(eval_path) if os.path.isdir(eval_path) else None
+    return dataset, eval_dataset
+
+
+def save_cached_datasets(path: str, dataset: Dataset, eval_dataset: Optional[Dataset]) -> None:
+    """Write the datasets to a temporary directory and move it into place, so readers never see a partial cache."""
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+    try:
+        dataset.save_to_disk(os.path.join(tmp_path, "train"))
+        if eval_dataset is not None:
+            eval_dataset.save_to_disk(os.path.join(tmp_path, "eval"))
+        os.replace(tmp_path, path)
+    except OSError:
+        # Read-only data dir, or another worker moved its copy into place first
+        shutil.rmtree(tmp_path, ignore_errors=True)
+
+
+def words_corpus_digest() -> str:
+    """Digest of the nltk words corpus that the textarena word lists are filtered from.
+
+    Raises LookupError when the corpus isn't installed.
+    """
+    pointer = nltk.data.find("corpora/words")
+    key = hashlib.sha1()
+    if isinstance(pointer, nltk.data.FileSystemPathPointer):
+        paths = [os.path.join(pointer.path, name) for name in sorted(os.listdir(pointer.path))]
+    else:
+        paths = [pointer.zipfile.filename]
+    for path in paths:
+        if os.path.isfile(path):
+            key.update(os.path.basename(path).encode())
+            with open(path, "rb") as f:
+                key.update(f.read())
+    return key.hexdigest()[:16]
+
+
+def game_spec_cache_path(game: str) -> Optional[str]:
+    """Cache file for `game`'s first prompt and word list, or None without a data dir or corpus.
+
+    Keyed by the env id, the corpus digest, the textarena version and this package's game code,
+    any of which can change the word list or the prompt.
+    """
+    try:
+        directory = feedback_table_dir()
+        digest = words_corpus_digest()
+    except LookupError:
+        return None
+    key = hashlib.sha1()
+    with open(hard_wordle.__file__, "rb") as f:
+        source = f.read()
+    for part in (game.encode(), digest.encode(), ta.__version__.encode(), source):
+        key.update(part)
+        key.update(b"\0")
+    return os.path.join(directory, f"hard_wordle_game_{key.hexdigest()[:16]}.json")
+
+
+def load_game_spec(path: str) -> Optional[Tuple[str, List[str]]]:
+    """The cached (prompt, word list), or None if the file doesn't exist."""
+    try:
+        with open(path) as f:
+            spec = json.load(f)
+    except FileNotFoundError:
+        return None
+    return spec["prompt"], spec["words"]
+
+
+def save_game_spec(path: str, prompt: str, words: Sequence[str]) -> None:
+    """Write the game spec to a temporary file and move it into place, like the dataset cache."""
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+    try:
+        with open(tmp_path, "w") as f:
+            json.dump({"prompt": prompt, "words": list(words)}, f)
+        os.replace(tmp_path, path)
+    except OSError:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+### rubric
+class HardWordleRubric(vf.Rubric):
+    """Rubric that can shard large scoring batches across a process pool.
+
+    With `num_workers` > 1, completions are reduced to (role, content) pairs and scored in
+    worker processes with the same reward functions and weights; the scores match the serial
+    path exactly. That covers batches from score_rollouts and, with a results path or ledger,
+    each rollout scored as its game ends (score_finished_rollout). Reward functions scored this
+    way may only use `parser`, `completion` and `answer`.
+    """
+
+    def __init__(self, num_workers: int = 0, **kwargs):
+        super().__init__(**kwargs)
+        self.num_workers = num_workers
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    async def score_rollout(self, prompt, completion, answer, state, task="default", info=None, **kwargs) -> vf.RolloutScore:
+        # The reward functions share one analysis of the completion, dropped once it is scored
+        with completion_analyses():
+            return await super().score_rollout(prompt, completion, answer, state, task, info, **kwargs)
+
+    async def score_rollouts(self, prompts, completions, answers, states, tasks, infos, max_concurrent: int = -1, **kwargs) -> vf.RolloutScores:
+        if self.num_workers <= 1 or len(completions) < PARALLEL_SCORING_MIN_ROLLOUTS:
+            return await super().score_rollouts(prompts, completions, answers, states, tasks, infos, max_concurrent=max_concurrent, **kwargs)
+        compact = [_compact_completion(completion) for completion in completions]
+        # A few shards per worker keeps them busy when completion lengths vary
+        shard_size = -(-len(compact) // (self.num_workers * 4))
+        loop = asyncio.get_running_loop()
+        executor = self._pool()
+        shards = [
+            loop.run_in_executor(
+                executor, score_completions, self.parser, self, compact[start:start + shard_size], list(answers[start:start + shard_size]),
+            )
+            for start in range(0, len(compact), shard_size)
+        ]
+        scores = np.concatenate(await asyncio.gather(*shards))
+        return vf.RolloutScores(
+            reward=scores[:, 0].tolist(),
+            metrics={name: scores[:, i + 1].tolist() for i, name in enumerate(self.get_reward_func_names())},
+        )
+
+    async def score_finished_rollout(self, prompt, completion, answer, state, task="default", info=None) -> vf.RolloutScore:
+        """Score one rollout as soon as its game ends, for evaluations that record rollouts one by one.
+
+        With `num_workers` > 1 the rollout is scored in a worker process, like the shards of
+        score_rollouts, so the event loop keeps playing the other games meanwhile.
+        """
+        if self.num_workers <= 1:
+            return await self.score_rollout(prompt, completion, answer, state, task=task, info=info)
+        loop = asyncio.get_running_loop()
+        scores = (await loop.run_in_executor(
+            self._pool(), score_completions, self.parser, self, [_compact_completion(completion)], [answer],
+        ))[0]
+        return vf.RolloutScore(
+            reward=float(scores[0]),
+            metrics={name: float(score) for name, score in zip(self.get_reward_func_names(), scores[1:])},
+        )
+
+    def __getstate__(self):
+        # Sent to the worker processes along with each shard; the pool stays in the parent
+        state = self.__dict__.copy()
+        state["_executor"] = None
+        return state
+
+    def _pool(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.num_workers)
+        return self._executor
+
+    def shutdown(self) -> None:
+        """Stop the scoring worker processes, if any were started."""
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+
+### environment
+# New class to override TextArenaEnv's ta_to_hf method
+class HardModeTextArenaEnv(TextArenaEnv):
+    # Bounds concurrent model requests during evaluate_async; None means unbounded
+    _in_flight: Optional[asyncio.Semaphore] = None
+    # (results writer, ledger, model, sampling args) for the rollouts a_generate is recording
+    _recording: Optional[Tuple[Optional[RolloutWriter], Optional[EvalLedger], str, Dict[str, Any]]] = None
+
+    # The textarena env, made on first use by the ta_env property
+    _ta_env: Optional[ta.Env] = None
+
+    def __init__(self, game: str = "Wordle-v0", num_train_examples: int = 1000, num_eval_examples: int = 0,
+                 system_prompt: Optional[str] = None, parser: Optional[vf.XMLParser] = None, rubric: Optional[vf.Rubric] = None,
+                 feedback_fn: Callable[[str], str] = lambda x: x, seed: int = 0,
+                 streaming: bool = False, ledger_path: Optional[str] = None, response_cache_path: Optional[str] = None,
+                 sampling: str = "uniform", difficulty_range: Optional[Sequence[int]] = None, **kwargs):
+        if sampling not in SAMPLING_MODES:
+            raise ValueError(f"sampling must be one of {SAMPLING_MODES}, got {sampling!r}")
+        if sampling == "curriculum" and streaming:
+            raise ValueError("Curriculum order needs the whole training split; it can't be streamed.")
+        self.streaming = streaming
+        self.sampling = sampling
+        self.difficulty_range = tuple(difficulty_range) if difficulty_range is not None else None
+        # Default ledger for evaluate/evaluate_async, so interrupted evaluations resume
+        self.ledger_path = ledger_path
+        # Serves repeated temperature-0 requests (e.g. every game's first turn) from disk
+        self.response_cache = ResponseCache(response_cache_path) if response_cache_path else None
+
+        # TextArenaEnv.__init__ would ta.make the game, POS-tagging the whole corpus and loading the
+        # dictionary, just to read the prompt and word list. Set up its fields here instead; the
+        # datasets come from the game spec cache and ta_env is made on the first env_response.
+        self.game = game
+        self.num_train_examples = num_train_examples
+        self.num_eval_examples = num_eval_examples
+        self.seed = seed
+        self.feedback_fn = feedback_fn
+        dataset, eval_dataset = self.ta_to_hf()
+        vf.MultiTurnEnv.__init__(
+            self,
+            dataset=dataset,
+            eval_dataset=eval_dataset,
+            system_prompt=system_prompt,
+            parser=parser or vf.XMLParser(fields=["think", "guess"], answer_field="guess"),
+            rubric=rubric,
+            message_type="chat",
+            **kwargs,
+        )
+
+    @property
+    def ta_env(self) -> ta.Env:
+        if self._ta_env is None:
+            self._ta_env = ta.make(env_id=self.game)
+        return self._ta_env
+
+    @ta_env.setter
+    def ta_env(self, ta_env: ta.Env) -> None:
+        self._ta_env = ta_env
+
+    def _eval_inputs(self, num_examples: int, rollouts_per_example: int) -> Dataset:
+        """Eval rows, repeated per rollout and tagged with example_id/rollout_id in `info`."""
+        if self.eval_dataset is None:
+            inputs = self.get_dataset(n=num_examples)
+        else:
+            inputs = self.get_eval_dataset(n=num_examples)
+        num_inputs = len(inputs)
+        if rollouts_per_example > 1:
+            inputs = inputs.repeat(rollouts_per_example)
+        # Repeated rows follow each other as whole copies of the inputs
+        return inputs.add_column("info", [{"example_id": i % num_inputs, "rollout_id": i // num_inputs} for i in range(len(inputs))])
+
+    def evaluate(self, client, model, sampling_args=None, num_examples=-1, rollouts_per_example=1, score_rollouts=True, max_concurrent=-1, **kwargs):
+        inputs = self._eval_inputs(num_examples, rollouts_per_example)
+        kwargs.setdefault("ledger_path", self.ledger_path)
+        return self.generate(inputs, client, model, sampling_args, score_rollouts, max_concurrent, **kwargs)
+
+    async def evaluate_async(
+        self,
+        client: AsyncOpenAI,
+        model: str,
+        max_in_flight: int = 64,
+        sampling_args: Optional[Dict[str, Any]] = None,
+        num_examples: int = -1,
+        rollouts_per_example: int = 1,
+        score_rollouts: bool = True,
+        results_path: Optional[str] = None,
+        ledger_path: Optional[str] = None,
+    ) -> vf.GenerateOutputs:
+        """Async counterpart of `evaluate` that interleaves turns across all games.
+
+        Every game runs concurrently; at most `max_in_flight` model requests are
+        outstanding at once, so a game waiting on the model never blocks the others.
+        With `results_path` (.jsonl or .parquet), each rollout is scored and written
+        as soon as its game ends; see RolloutWriter. With `ledger_path` (default: the
+        env's), rollouts already in the ledger are reused instead of replayed; see EvalLedger.
+        """
+        inputs = self._eval_inputs(num_examples, rollouts_per_example)
+        self._in_flight = asyncio.Semaphore(max_in_flight)
+        try:
+            return await self.a_generate(
+                inputs, client=client, model=model, sampling_args=sampling_args, score_rollouts=score_rollouts,
+                results_path=results_path, ledger_path=ledger_path or self.ledger_path,
+            )
+        finally:
+            self._in_flight = None
+
+    async def a_generate(self, inputs, client=None, model=None, sampling_args=None, score_rollouts=True, max_concurrent=-1,
+                         results_path: Optional[str] = None, ledger_path: Optional[str] = None, **kwargs) -> vf.GenerateOutputs:
+        if (results_path is None and ledger_path is None) or not isinstance(inputs, Dataset):
+            results = await super().a_generate(inputs, client, model, sampling_args, score_rollouts, max_concurrent, **kwargs)
+        else:
+            results = await self._recorded_generate(inputs, client, model, sampling_args, max_concurrent, results_path, ledger_path, **kwargs)
+        if self.response_cache is not None:
+            self.logger.info(f"Response cache: {self.response_cache.stats()}")
+        return results
+
+    async def _recorded_generate(self, inputs: Dataset, client, model, sampling_args, max_concurrent: int,
+                                 results_path: Optional[str], ledger_path: Optional[str], **kwargs) -> vf.GenerateOutputs:
+        # Rollouts are scored as they finish, so the results file and ledger never wait for the batch
+        model = model or self.model
+        if "info" not in inputs.column_names:
+            inputs = inputs.add_column("info", [{"example_id": i, "rollout_id": 0} for i in range(len(inputs))])
+        gen_sampling_args = {**self.sampling_args, **(sampling_args or {})}
+        writer = RolloutWriter(results_path, meta={"model": model, "sampling_args": gen_sampling_args}) if results_path else None
+        ledger = EvalLedger(ledger_path) if ledger_path else None
+        try:
+            finished = {}
+            if ledger is not None:
+                for i, (info, answer) in enumerate(zip(inputs["info"], inputs["answer"])):
+                    row = ledger.get(EvalLedger.key(info["example_id"], answer, info["rollout_id"], model, gen_sampling_args))
+                    if row is not None:
+                        finished[i] = row
+                        if writer is not None:
+                            writer.write(row)
+            pending = [i for i in range(len(inputs)) if i not in finished]
+
+            generated = None
+            if pending:
+                # Keys use this copy of the sampling args; requests may rewrite the one rollouts get
+                self._recording = (writer, ledger, model, gen_sampling_args)
+                try:
+                    generated = await super().a_generate(inputs.select(pending), client, model, sampling_args, False, max_concurrent, **kwargs)
+                finally:
+                    self._recording = None
+        finally:
+            if writer is not None:
+                writer.close()
+            if ledger is not None:
+                ledger.close()
+
+        # Merge replayed and resumed rollouts back into input order
+        generated_at = dict(zip(pending, range(len(pending))))
+        results = vf.GenerateOutputs(
+            prompt=[], completion=[], answer=list(inputs["answer"]), state=[], info=list(inputs["info"]),
+            task=list(inputs["task"]) if "task" in inputs.column_names else ["default"] * len(inputs), reward=[], metrics={},
+        )
+        rows = []
+        for i in range(len(inputs)):
+            if i in finished:
+                row = finished[i]
+                results.prompt.append(inputs[i]["prompt"])
+                results.completion.append(row["completion"])
+                results.state.append({"resumed": True})
+            else:
+                j = generated_at[i]
+                row = generated.state[j].pop("rollout_row")
+                results.prompt.append(generated.prompt[j])
+                results.completion.append(generated.completion[j])
+                results.state.append(generated.state[j])
+            rows.append(row)
+        results.reward = [row["reward"] for row in rows]
+        results.metrics = {name: [row["metrics"][name] for row in rows] for name in (rows[0]["metrics"] if rows else {})}
+        return results
+
+    async def rollout(self, client, model, prompt, answer="", task="default", info=None, sampling_args=None, **kwargs):
+        completion, state = await super().rollout(client, model, prompt, answer, task, info, sampling_args, **kwargs)
+        if self._recording is not None:
+            writer, ledger, key_model, key_sampling_args = self._recording
+            if isinstance(self.rubric, HardWordleRubric):
+                # Uses the rubric's worker processes when it has them
+                score = await self.rubric.score_finished_rollout(prompt, completion, answer, state, task=task, info=info)
+            else:
+                score = await self.rubric.score_rollout(prompt, completion, answer, state, task=task, info=info)
+            info = info or {}
+            row = {
+                "example_id": info.get("example_id"),
+                "rollout_id": info.get("rollout_id"),
+                "answer": answer,
+                "reward": score.reward,
+                "metrics": score.metrics,
+                "completion": completion,
+            }
+            state["rollout_row"] = row
+            if ledger is not None:
+                ledger.record(EvalLedger.key(row["example_id"], answer, row["rollout_id"], key_model, key_sampling_args), row)
+            if writer is not None:
+                writer.write(row)
+        return completion, state
+
+    async def get_model_response(self, client, model, prompt, oai_tools=None, sampling_args=None, message_type=None, **kwargs):
+        cache = self.response_cache
+        if cache is None or oai_tools or (message_type or self.message_type) != "chat" or not cache.accepts(sampling_args):
+            return await self._request_model_response(client, model, prompt, oai_tools, sampling_args, message_type, **kwargs)
+        key = cache.key(model, sampling_args, prompt)
+        return await cache.get_or_fetch(
+            key, lambda: self._request_model_response(client, model, prompt, oai_tools, sampling_args, message_type, **kwargs),
+        )
+
+    async def _request_model_response(self, client, model, prompt, oai_tools=None, sampling_args=None, message_type=None, **kwargs):
+        if self._in_flight is None:
+            return await super().get_model_response(client, model, prompt, oai_tools, sampling_args, message_type, **kwargs)
+        async with self._in_flight:
+            return await super().get_model_response(client, model, prompt, oai_tools, sampling_args, message_type, **kwargs)
+
+    async def env_response(self, messages, state, **kwargs):
+        if "ta_env" not in state:
+            # A shallow copy shares the word list, dictionary and word bank; reset() gives it
+            # fresh game state. Deep-copying the dictionary per game would stall the event loop.
+            ta_env = copy.copy(self.ta_env)
+            ta_env.reset(num_players=1)
+            ta_env.state.game_state["secret_word"] = state["answer"]
+            state["ta_env"] = ta_env
+        return await super().env_response(messages, state, **kwargs)
+
+    def ta_to_hf(self) -> Tuple[Dataset, Optional[Dataset]]:
+        question, words = self._game_spec()
+        features = Features({"question": Value("string"), "answer": Value("string")})
+        index = self._difficulty_index(words)
+        if self.streaming:
+            return self._streaming_datasets(question, words, features, index)
+
+        sampling_spec = "" if index is None else f"{self.sampling}:{self.difficulty_range}:{index.digest}"
+        cache_path = dataset_cache_path(self.game, self.seed, self.num_train_examples, self.num_eval_examples, question, words, sampling_spec)
+        if cache_path is not None:
+            cached = load_cached_datasets(cache_path)
+            if cached is not None:
+                return cached
+
+        if index is None:
+            answer_stream = sample_answers(words, self.seed)
+        else:
+            answer_stream = difficulty_answers(words, self.seed, index, self.sampling, self.difficulty_range)
+        answers = list(itertools.islice(answer_stream, self.num_train_examples + self.num_eval_examples))
+        train_answers = answers[:self.num_train_examples]
+        eval_answers = answers[self.num_train_examples:]
+        if self.sampling == "curriculum":
+            train_answers.sort(key=index.order_key)
+
+        dataset = Dataset.from_dict({"question": [question] * len(train_answers), "answer": train_answers}, features=features)
+        if self.num_eval_examples > 0:
+            eval_dataset = Dataset.from_dict({"question": [question] * len(eval_answers), "answer": eval_answers}, features=features)
+        else:
+            eval_dataset = None
+        if cache_path is not None:
+            save_cached_datasets(cache_path, dataset, eval_dataset)
+        return dataset, eval_dataset
+
+    def _game_spec(self) -> Tuple[str, List[str]]:
+        """The game's first prompt and its word list, from the game spec cache when it has them."""
+        cache_path = game_spec_cache_path(self.game)
+        if cache_path is not None:
+            cached = load_game_spec(cache_path)
+            if cached is not None:
+                return cached
+        self.ta_env.reset(num_players=1)
+        _, user_prompt = self.ta_env.get_observation()
+        # The observation list was always stored through the string column's cast, i.e. as its str()
+        question = str(user_prompt)
+        words = list(self.ta_env.word_list)
+        if cache_path is not None:
+            save_game_spec(cache_path, question, words)
+        return question, words
+
+    def _difficulty_index(self, words: Sequence[str]) -> Optional[DifficultyIndex]:
+        """The word list's difficulty index when sampling uses it, else None."""
+        if self.sampling == "uniform" and self.difficulty_range is None:
+            return None
+        index = DifficultyIndex.load(get_word_bank(words))
+        if index is None:
+            raise FileNotFoundError(
+                "No difficulty index for this word list; build it with "
+                "`uv run python -c \"import hard_wordle_solver; hard_wordle_solver.build_difficulty_index()\"`."
+            )
+        return index
+
+    def _streaming_datasets(self, question: str, words: Sequence[str], features: Features,
+                            index: Optional[DifficultyIndex] = None) -> Tuple[IterableDataset, Optional[Dataset]]:
+        """Train rows are drawn on demand. The eval split is still eager and follows them in the
+        sequence, so building it draws (and discards) num_train_examples answers first."""
+        words = tuple(words)
+        total = self.num_train_examples + self.num_eval_examples
+        sampling_kwargs = {"index": index, "sampling": self.sampling, "difficulty_range": self.difficulty_range}
+        dataset = IterableDataset.from_generator(
+            _streaming_rows,
+            gen_kwargs={"question": question, "words": words, "seed": self.seed, "start": 0, "stop": self.num_train_examples, **sampling_kwargs},
+            features=features,
+        )
+        eval_dataset = None
+        if self.num_eval_examples > 0:
+            eval_rows = _streaming_rows(question, words, self.seed, self.num_train_examples, total, **sampling_kwargs)
+            eval_dataset = Dataset.from_list(list(eval_rows), features=features)
+        return dataset, eval_dataset
+
+    def get_dataset(self, n: int = -1, seed: Optional[int] = None):
+        if not isinstance(self.dataset, IterableDataset):
+            return super().get_dataset(n, seed)
+        # IterableDataset has no select(); shuffle within a buffer and take the first n rows
+        if seed is not None:
+            self.dataset = self.dataset.shuffle(seed=seed)
+        if n > 0:
+            return self.dataset.take(n)
+        return self.dataset
@@ -0,0 +1,89 @@
+"""Load test of the full rollout loop against the bundled mock model server.
+
+Starts mock_model_server in this process (or targets --base-url), then runs
+load_environment(...).evaluate at each concurrency level and reports games/sec and
+turns/sec. Needs no network access or API key.
+
+    python loadtest_hard_wordle.py --games 64 --concurrency 1 4 16 64 --latency-ms 50
+    python loadtest_hard_wordle.py --latency lognormal --latency-ms 300 --error-rate 0.02 --save loadtest.json
+"""
+import argparse
+import json
+import platform
+import sys
+import time
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from hard_wordle import load_environment, make_async_client
+from mock_model_server import MOCK_MODEL_NAME, add_server_arguments, server_from_arguments
+
+DEFAULT_CONCURRENCY = (1, 4, 16, 64)
+
+
+def count_turns(completion: List[Dict[str, Any]]) -> int:
+    return sum(1 for message in completion if message["role"] == "assistant")
+
+
+def run_level(vf_env, base_url: str, games: int, concurrency: int, max_retries: int) -> Dict[str, float]:
+    """Evaluate `games` games with at most `concurrency` in flight; throughput and reward of the run."""
+    client = make_async_client(base_url=base_url, api_key="mock", max_in_flight=concurrency, max_retries=max_retries)
+    start = time.perf_counter()
+    results = vf_env.evaluate(client=client, model=MOCK_MODEL_NAME, num_examples=games, max_concurrent=concurrency)
+    seconds = time.perf_counter() - start
+    turns = sum(count_turns(completion) for completion in results.completion)
+    return {
+        "concurrency": concurrency,
+        "games": len(results.completion),
+        "turns": turns,
+        "seconds": seconds,
+        "games_per_sec": len(results.completion) / seconds,
+        "turns_per_sec": turns / seconds,
+        "mean_reward": float(np.mean(results.reward)),
+        "solved": float(np.mean(results.metrics["check_answer_reward_func"])),
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--games", type=int, default=64, help="Games per concurrency level")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=list(DEFAULT_CONCURRENCY))
+    parser.add_argument("--base-url", help="Use an already running mock server instead of starting one")
+    parser.add_argument("--max-retries", type=int, default=3, help="Client retries for failed requests")
+    parser.add_argument("--save", help="Write the results to this JSON file")
+    add_server_arguments(parser)
+    args = parser.parse_args(argv)
+
+    vf_env = load_environment(num_train_examples=1, num_eval_examples=args.games, word_length=args.word_length)
+    server = None
+    base_url = args.base_url
+    if base_url is None:
+        server = server_from_arguments(args)
+        base_url = server.start()
+
+    results = []
+    print(f"{'concurrency':>11} {'games':>6} {'turns':>6} {'seconds':>8} {'games/s':>8} {'turns/s':>8} {'reward':>7} {'solved':>7} {'errors':>6}")
+    try:
+        for concurrency in args.concurrency:
+            errors_before = server.stats()["errors"] if server else 0
+            level = run_level(vf_env, base_url, args.games, concurrency, args.max_retries)
+            level["server_errors"] = server.stats()["errors"] - errors_before if server else 0
+            results.append(level)
+            print(f"{concurrency:>11} {level['games']:>6} {level['turns']:>6} {level['seconds']:>8.2f} {level['games_per_sec']:>8.2f} "
+                  f"{level['turns_per_sec']:>8.2f} {level['mean_reward']:>7.3f} {level['solved']:>7.2f} {level['server_errors']:>6}")
+    finally:
+        if server is not None:
+            server.stop()
+
+    if args.save:
+        meta = {"python": platform.python_version(), "machine": platform.machine(),
+                "args": {key: value for key, value in vars(args).items() if key != "save"}}
+        with open(args.save, "w") as f:
+            json.dump({"meta": meta, "results": results}, f, indent=2)
+        print(f"Results written to {args.save}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
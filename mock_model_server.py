@@ -0,0 +1,318 @@
+"""OpenAI-compatible chat completions server that plays HardWordle, for offline load tests.
+
+Every request carries the whole game so far, so the server is stateless: it reads the
+scored guesses and their G/Y/X feedback back out of the conversation and answers with the
+next guess of its policy, in the <think>/<guess> format the rubric expects. Latency, error
+rate, invalid moves and response length are configurable, so the rollout loop can be
+load-tested without network access or an API key:
+
+    python mock_model_server.py --port 8000 --latency lognormal --latency-ms 200 --error-rate 0.01
+
+Then point any OpenAI client at http://127.0.0.1:8000/v1. See loadtest_hard_wordle.py.
+"""
+import argparse
+import json
+import math
+import random
+import re
+import threading
+import time
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from hard_wordle import HardModeConstraints, HardWordleEnv, feedback_code
+from hard_wordle_solver import HardModeSolver
+
+POLICIES = ("solver", "random")
+LATENCY_MODELS = ("fixed", "uniform", "exponential", "lognormal")
+INVALID_KINDS = ("format", "length", "dictionary", "hard_mode")
+MOCK_MODEL_NAME = "mock-hard-wordle"
+
+# (guess, feedback) pairs, the same shape as game_state["guess_history"]
+History = Tuple[Tuple[str, Tuple[str, ...]], ...]
+
+
+class LatencyModel:
+    """Per-request delay in seconds, drawn around a mean of `mean_ms`.
+
+    "uniform" draws from mean_ms * [1 - spread, 1 + spread]; "lognormal" uses `spread` as
+    the sigma of the underlying normal, so larger values give a longer tail.
+    """
+
+    def __init__(self, kind: str = "fixed", mean_ms: float = 0.0, spread: float = 0.5):
+        if kind not in LATENCY_MODELS:
+            raise ValueError(f"latency must be one of {LATENCY_MODELS}, got {kind!r}")
+        self.kind = kind
+        self.mean_ms = mean_ms
+        self.spread = spread
+
+    def sample(self, rng: random.Random) -> float:
+        if self.mean_ms <= 0:
+            return 0.0
+        if self.kind == "fixed":
+            ms = self.mean_ms
+        elif self.kind == "uniform":
+            ms = self.mean_ms * rng.uniform(1 - self.spread, 1 + self.spread)
+        elif self.kind == "exponential":
+            ms = rng.expovariate(1 / self.mean_ms)
+        else:
+            # mu chosen so the distribution's mean is mean_ms
+            ms = rng.lognormvariate(math.log(self.mean_ms) - self.spread ** 2 / 2, self.spread)
+        return max(ms, 0.0) / 1000
+
+
+def read_history(messages: Sequence[Dict[str, Any]], word_length: int) -> History:
+    """Scored guesses and feedback, from the board rows (e.g. "C R A N E" over "X X Y X G") in user messages."""
+    board_row = re.compile(rf"^([A-Z](?: [A-Z]){{{word_length - 1}}})\n([GYX](?: [GYX]){{{word_length - 1}}})$", re.M)
+    history = []
+    for message in messages:
+        if message.get("role") != "user" or not isinstance(message.get("content"), str):
+            continue
+        rows = board_row.findall(message["content"])
+        if rows:
+            letters, marks = rows[-1]
+            history.append((letters.replace(" ", "").lower(), tuple(marks.split())))
+    return tuple(history)
+
+
+class MockPlayer:
+    """Chooses each reply: the hard-mode solver's guess or a random legal word, sometimes an invalid move.
+
+    `invalid_rate` is the chance a turn's guess is replaced by one of INVALID_KINDS. The
+    <think> block holds about `think_words` filler words, to vary response length.
+    """
+
+    def __init__(self, solver: HardModeSolver, policy: str = "solver", invalid_rate: float = 0.0, think_words: int = 20):
+        if policy not in POLICIES:
+            raise ValueError(f"policy must be one of {POLICIES}, got {policy!r}")
+        self.solver = solver
+        self.word_length = solver.word_bank.word_length
+        self.policy = policy
+        self.invalid_rate = invalid_rate
+        self.think_words = think_words
+        self.words = [word for word, i in solver.word_bank.index.items() if solver.playable[i]]
+        # Games that start alike share the solver's work for their common turns
+        self._solver_guess = lru_cache(maxsize=1 << 16)(self._solve)
+
+    @classmethod
+    def for_word_length(cls, word_length: int = 5, **kwargs) -> "MockPlayer":
+        env = HardWordleEnv(word_length=word_length, num_guesses=word_length + 1)
+        return cls(HardModeSolver.for_env(env), **kwargs)
+
+    def _game(self, history: History) -> Tuple[HardModeConstraints, np.ndarray]:
+        word_bank = self.solver.word_bank
+        constraints = HardModeConstraints(self.word_length)
+        candidates = np.ones(len(word_bank.words), dtype=bool)
+        for word, feedback in history:
+            constraints.update(word, feedback)
+            remaining = np.flatnonzero(candidates)
+            candidates = np.zeros_like(candidates)
+            candidates[remaining[word_bank.score(word, remaining) == feedback_code(feedback)]] = True
+        return constraints, candidates
+
+    def _solve(self, history: History) -> str:
+        constraints, candidates = self._game(history)
+        return self.solver.next_guess(constraints, candidates, history)
+
+    def guess(self, history: History, rng: random.Random) -> str:
+        """Bracketed guess (or invalid move) for the game so far."""
+        if rng.random() < self.invalid_rate:
+            return self._invalid_move(history, rng)
+        if self.policy == "solver":
+            return f"[{self._solver_guess(history)}]"
+        constraints, _ = self._game(history)
+        allowed = np.flatnonzero(self.solver.allowed(constraints, history))
+        if len(allowed) == 0:
+            return f"[{rng.choice(self.words)}]"
+        return f"[{self.solver.word_bank.words[rng.choice(allowed)]}]"
+
+    def _invalid_move(self, history: History, rng: random.Random) -> str:
+        kind = rng.choice(INVALID_KINDS)
+        word = rng.choice(self.words)
+        if kind == "format":
+            return word
+        if kind == "length":
+            return f"[{word}{word[-1]}]"
+        if kind == "dictionary":
+            return "[" + "".join(rng.choice("qxzj") for _ in range(self.word_length)) + "]"
+        constraints, _ = self._game(history)
+        illegal = [word for word in rng.sample(self.words, min(len(self.words), 64)) if constraints.violation(word) is not None]
+        return f"[{illegal[0] if illegal else word}]"
+
+    def reply(self, messages: Sequence[Dict[str, Any]], rng: random.Random) -> str:
+        history = read_history(messages, self.word_length)
+        guess = self.guess(history, rng)
+        count = rng.randint(self.think_words // 2, self.think_words * 3 // 2) if self.think_words else 0
+        think = " ".join(rng.choice(self.words) for _ in range(count))
+        return f"<think>\n{think}\n</think>\n<guess>{guess}</guess>"
+
+
+def _completion(model: str, content: str, messages: Sequence[Dict[str, Any]]) -> Dict[str, Any]:
+    # Token counts are estimated at four characters per token
+    prompt_tokens = sum(len(str(message.get("content", ""))) for message in messages) // 4
+    completion_tokens = len(content) // 4
+    return {
+        "id": f"mock-{random.getrandbits(64):016x}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+        "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens, "total_tokens": prompt_tokens + completion_tokens},
+    }
+
+
+class MockModelServer:
+    """Threaded HTTP server for POST /v1/chat/completions (and GET /v1/models) backed by a MockPlayer.
+
+    Each request first waits a delay from `latency`; then, with probability `error_rate`,
+    it fails with `error_status` so the client's retry path is exercised too.
+    """
+
+    def __init__(self, player: MockPlayer, latency: Optional[LatencyModel] = None, error_rate: float = 0.0,
+                 error_status: int = 500, host: str = "127.0.0.1", port: int = 0, seed: int = 0):
+        self.player = player
+        self.latency = latency or LatencyModel()
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.requests = 0
+        self.errors = 0
+        self.completion_chars = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._httpd = _Server((host, port), _Handler)
+        self._httpd.mock = self
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self) -> str:
+        """Serve from a daemon thread; returns the base URL for the OpenAI client."""
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self.base_url
+
+    def serve_forever(self) -> None:
+        """Serve from the calling thread until interrupted."""
+        try:
+            self._httpd.serve_forever()
+        finally:
+            self._httpd.server_close()
+
+    def stop(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def __enter__(self) -> "MockModelServer":
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"requests": self.requests, "errors": self.errors, "completion_chars": self.completion_chars}
+
+    def handle(self, request: Dict[str, Any]) -> Tuple[int, Dict[str, Any]]:
+        """Status code and JSON body for one chat completions request."""
+        with self._lock:
+            self.requests += 1
+            # One child RNG per request keeps draws reproducible for a given request order
+            rng = random.Random(self._rng.getrandbits(64))
+        time.sleep(self.latency.sample(rng))
+        if rng.random() < self.error_rate:
+            with self._lock:
+                self.errors += 1
+            return self.error_status, {"error": {"message": "Injected mock server error.", "type": "server_error", "code": self.error_status}}
+        messages = request.get("messages") or []
+        content = self.player.reply(messages, rng)
+        with self._lock:
+            self.completion_chars += len(content)
+        return 200, _completion(request.get("model", MOCK_MODEL_NAME), content, messages)
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024  # the default backlog of 5 drops connections under high concurrency
+    mock: MockModelServer
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, so the client pool reuses connections
+    disable_nagle_algorithm = True
+    server: _Server
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            return self._send(404, {"error": {"message": f"Unknown path {self.path}", "type": "invalid_request_error"}})
+        try:
+            request = json.loads(body)
+        except json.JSONDecodeError as e:
+            return self._send(400, {"error": {"message": f"Invalid JSON: {e}", "type": "invalid_request_error"}})
+        self._send(*self.server.mock.handle(request))
+
+    def do_GET(self):
+        if self.path.rstrip("/").endswith("/models"):
+            return self._send(200, {"object": "list", "data": [{"id": MOCK_MODEL_NAME, "object": "model", "created": 0, "owned_by": "mock"}]})
+        self._send(404, {"error": {"message": f"Unknown path {self.path}", "type": "invalid_request_error"}})
+
+    def _send(self, status: int, payload: Dict[str, Any]) -> None:
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def add_server_arguments(parser: argparse.ArgumentParser) -> None:
+    """Options shared by this script and loadtest_hard_wordle.py."""
+    parser.add_argument("--policy", choices=POLICIES, default="solver", help="Solver guesses, or random hard-mode-legal words")
+    parser.add_argument("--invalid-rate", type=float, default=0.0, help="Chance a turn is an invalid move instead")
+    parser.add_argument("--think-words", type=int, default=20, help="Mean filler words in each <think> block")
+    parser.add_argument("--latency", choices=LATENCY_MODELS, default="fixed")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Mean delay per request")
+    parser.add_argument("--latency-spread", type=float, default=0.5, help="Relative spread (uniform) or sigma (lognormal)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Chance a request fails with --error-status")
+    parser.add_argument("--error-status", type=int, default=500)
+    parser.add_argument("--word-length", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+
+
+def server_from_arguments(args: argparse.Namespace, host: str = "127.0.0.1", port: int = 0) -> MockModelServer:
+    player = MockPlayer.for_word_length(args.word_length, policy=args.policy, invalid_rate=args.invalid_rate, think_words=args.think_words)
+    latency = LatencyModel(args.latency, args.latency_ms, args.latency_spread)
+    return MockModelServer(player, latency, args.error_rate, args.error_status, host=host, port=port, seed=args.seed)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    add_server_arguments(parser)
+    args = parser.parse_args(argv)
+
+    server = server_from_arguments(args, args.host, args.port)
+    print(f"Serving {MOCK_MODEL_NAME} at {server.base_url}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    print(json.dumps(server.stats()))
+
+
+if __name__ == "__main__":
+    main()
@@ -11,6 +11,56 @@ def make_guess(env, guess_word):
     is_done, info = env.step(action)
     return is_done, info
 
+# Seconds the stub model server waits before answering each request
+STUB_LATENCY = 0.05
+# JSON bodies of the requests the stub model server received
+STUB_REQUESTS = []
+
+
+@pytest.fixture
+def stub_openai_server():
+    # Local OpenAI-compatible server that always answers with the same canned guess
+    import json
+    import threading
+    import time
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class StubHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive, so the client pool reuses connections
+        disable_nagle_algorithm = True
+
+        def do_POST(self):
+            STUB_REQUESTS.append(json.loads(self.rfile.read(int(self.headers["Content-Length"]))))
+            time.sleep(STUB_LATENCY)
+            body = json.dumps({
+                "id": "stub",
+                "object": "chat.completion",
+                "created": 0,
+                "model": "stub",
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": "<think>\nA common opener.\n</think>\n<guess>[crane]</guess>"},
+                    "finish_reason": "stop",
+                }],
+                "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2},
+            }).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    class StubServer(ThreadingHTTPServer):
+        request_queue_size = 64  # the default backlog of 5 drops SYNs when 8 clients connect at once
+
+    server = StubServer(("127.0.0.1", 0), StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/v1"
+    server.shutdown()
+
 # Test fixture for a fresh hard wordle environment
 @pytest.fixture
 def hard_wordle_env():
@@ -86,6 +136,21 @@ def test_hard_mode_yellow_violation(hard_wordle_env):
     # The hard mode violation should be recorded but the game should continue
     assert len(env.state.game_state["guess_history"]) == 1
 
+def test_extract_guess_uses_last_bracketed_word(hard_wordle_env):
+    from hard_wordle import extract_guess, invalid_move_reason
+
+    assert extract_guess("[crane]") == "crane"
+    assert extract_guess("Maybe [apple]? No: [not a word] then [crane] and [ ]") == "crane"
+    assert extract_guess("no brackets here") is None
+    # Reasons are interned, so repeated rejections reuse one string
+    assert invalid_move_reason("green", "a", 0) is invalid_move_reason("green", "a", 0)
+
+    reasoning = "<think>" + "I could try [apple] here. " * 500 + "</think>"
+    is_done, info = make_guess(hard_wordle_env, reasoning + "<guess>[crane]</guess>")
+    assert not is_done
+    assert hard_wordle_env.state.game_state["guess_history"][-1][0] == "crane"
+
+
 def test_hard_mode_valid_second_guess(hard_wordle_env):
     env = hard_wordle_env
     make_guess(env, "apply") # Secret: apple. Feedback: G G G G X ('a','p','p','l' are green)
@@ -119,6 +184,21 @@ def test_count_turns_reward_func():
     assert reward == 0.25
 
 
+def test_import_defers_verifiers_and_datasets():
+    # The game and reward functions import without verifiers, datasets or openai; load_environment loads them
+    import os
+    import subprocess
+    import sys
+
+    code = "import sys, hard_wordle; print(sorted(m for m in ('verifiers', 'datasets', 'openai', 'httpx') if m in sys.modules))"
+    result = subprocess.run([sys.executable, "-c", code], cwd=os.path.dirname(os.path.abspath(__file__)), capture_output=True, text=True, check=True)
+    assert result.stdout.splitlines()[-1] == "[]"
+
+    import hard_wordle
+    import hard_wordle_verifiers
+    assert hard_wordle.HardModeTextArenaEnv is hard_wordle_verifiers.HardModeTextArenaEnv
+
+
 def test_partial_credit_reward_func():
     # Test the partial_credit_reward_func directly without using the wrapper
     from hard_wordle import partial_credit_reward_func
@@ -155,6 +235,97 @@ def test_partial_credit_reward_func_invalid_move():
     # Should return 0.0 for invalid moves that don't have feedback scoring
     assert reward == 0.0
 
+
+def test_partial_credit_reward_func_word_length():
+    # Only board rows count (not the Y of "You have ..."), and credit is scaled to the answer's length
+    from hard_wordle import partial_credit_reward_func
+    from verifiers.parsers.xml_parser import XMLParser
+
+    parser = XMLParser(fields=["guess"], answer_field="guess")
+    five = [
+        {"role": "assistant", "content": "<guess>[goats]</guess>"},
+        {"role": "user", "content": "You submitted [goats].\nFeedback:\nG O A T S\nG G X Y Y\nYou have 5 guesses left."},
+    ]
+    assert partial_credit_reward_func(parser, five, answer="gouts") == 0.2 * 2 + 0.1 * 2
+    seven = [
+        {"role": "assistant", "content": "<guess>[planets]</guess>"},
+        {"role": "user", "content": "You submitted [planets].\nFeedback:\nP L A N E T S\nG G X Y X X X\nYou have 5 guesses left."},
+    ]
+    assert partial_credit_reward_func(parser, seven, answer="plucked") == (2 + 0.5) / 7
+
+def test_completion_analysis_matches_parser():
+    # The shared single-pass analysis agrees with XMLParser and is computed once per completion while scoring
+    from hard_wordle import analyze_completion, completion_analyses, format_reward_func
+    from verifiers.parsers.xml_parser import XMLParser
+
+    completion = [
+        {"role": "assistant", "content": "<think>\nStart with common letters.\n</think>\n<guess>[crane]</guess>"},
+        {"role": "user", "content": "You submitted [crane].\nFeedback:\nC R A N E\nX X Y X G"},
+        {"role": "assistant", "content": "  <think>Keep A and E.</think> <guess> [apple] </guess>\n"},
+        {"role": "user", "content": "Congratulations! You guessed the word correctly!"},
+        {"role": "assistant", "content": "<think>unclosed <guess>"},
+    ]
+    parser = XMLParser(fields=["think", "guess"], answer_field="guess")
+    with completion_analyses():
+        analysis = analyze_completion(parser, completion)
+        assert analysis is analyze_completion(parser, completion)
+    # Nothing outlives the scoring call
+    assert analysis is not analyze_completion(parser, completion)
+    assert analysis.guess == parser.parse_answer(completion) == "[apple]"
+    assert analysis.num_turns == 3
+    assert analysis.scoring is None
+    assert format_reward_func(parser, completion) == parser.get_format_reward_func()(completion)
+
+def test_parallel_scoring_matches_serial():
+    # Sharding completions across worker processes gives the serial scores, bit for bit, in order
+    import asyncio
+    import random
+    from hard_wordle import (
+        HardWordleRubric, PARALLEL_SCORING_MIN_ROLLOUTS, check_answer_reward_func,
+        count_turns_reward_func, partial_credit_reward_func, format_reward_func, score_completions,
+    )
+    from verifiers.parsers.xml_parser import XMLParser
+
+    rng = random.Random(0)
+    words = ["crane", "apple", "plank", "rates"]
+    completions, answers = [], []
+    for _ in range(2 * PARALLEL_SCORING_MIN_ROLLOUTS):
+        completion = [{"role": "system", "content": "ignored"}]
+        for _ in range(rng.randint(1, 6)):
+            word = rng.choice(words)
+            completion.append({"role": "assistant", "content": f"<think>{' hmm' * rng.randint(0, 50)}</think>\n<guess>[{word}]</guess>"})
+            marks = " ".join(rng.choice("GYX") for _ in range(5))
+            completion.append({"role": "user", "content": f"You submitted [{word}].\nFeedback:\n{' '.join(word.upper())}\n{marks}"})
+        completions.append(completion)
+        answers.append(rng.choice(words))
+
+    def make_rubric(num_workers):
+        parser = XMLParser(fields=["think", "guess"], answer_field="guess")
+        rubric = HardWordleRubric(parser=parser, num_workers=num_workers)
+        for func in (check_answer_reward_func, partial_credit_reward_func, count_turns_reward_func):
+            rubric.add_reward_func(func)
+        rubric.add_reward_func(format_reward_func, weight=0.2)
+        return rubric
+
+    def score(num_workers):
+        rubric = make_rubric(num_workers)
+        n = len(completions)
+        try:
+            return asyncio.run(rubric.score_rollouts([[]] * n, completions, answers, [{}] * n, ["default"] * n, [{}] * n))
+        finally:
+            rubric.shutdown()
+
+    serial, parallel = score(0), score(2)
+    assert parallel.reward == serial.reward
+    assert parallel.metrics == serial.metrics
+    assert any(reward > 0 for reward in serial.reward)
+
+    # The same rows, synchronously, for callers outside verifiers' scoring loop
+    rubric = make_rubric(0)
+    rows = score_completions(rubric.parser, rubric, completions, answers)
+    assert rows[:, 0].tolist() == serial.reward
+    assert [rows[:, i + 1].tolist() for i in range(len(serial.metrics))] == [serial.metrics[name] for name in rubric.get_reward_func_names()]
+
 def test_disallowed_letters_are_not_required(hard_wordle_env):
     env = hard_wordle_env
     make_guess(env, "taser") # Secret: apple. Feedback: T(X) A(Y) S(X) E(Y) R(X)
@@ -166,3 +337,690 @@ def test_disallowed_letters_are_not_required(hard_wordle_env):
     assert is_done  # This should be a win
     assert info["reward"] == 1.0
     assert "Congratulations!" in info["reason"]
+
+
+def test_score_guesses_matches_wordle_env():
+    # The vectorized kernel must agree with WordleEnv._evaluate_guess, including repeated letters
+    from types import SimpleNamespace
+    from textarena.envs.Wordle.env import WordleEnv
+    from hard_wordle import encode_words, score_guesses, feedback_patterns
+
+    words = ["apple", "paper", "llama", "eerie", "geese", "crane", "speed", "abbey", "babes", "alley"]
+    codes = score_guesses(encode_words(words), encode_words(words))
+    patterns = feedback_patterns(5)
+    for i, guess in enumerate(words):
+        for j, secret in enumerate(words):
+            reference_env = SimpleNamespace(word_length=5, state=SimpleNamespace(game_state={"word_length": 5, "secret_word": secret}))
+            assert list(patterns[codes[i, j]]) == WordleEnv._evaluate_guess(reference_env, guess)
+
+
+def test_feedback_table_lookup(hard_wordle_env, tmp_path, monkeypatch):
+    # With a precomputed table on disk, step() scores guesses from the memory-mapped table
+    from hard_wordle import WordBank
+    import numpy as np
+
+    monkeypatch.setenv("HARD_WORDLE_DATA_DIR", str(tmp_path))
+    bank = WordBank(["apple", "crane", "apply", "rates", "taser"])
+    path = bank.build_feedback_table()
+    assert isinstance(bank.feedback_table(), np.memmap)
+    assert bank.feedback_table().shape == (5, 5)
+    assert path.startswith(str(tmp_path))
+
+    env = hard_wordle_env
+    env.word_bank = bank
+    is_done, info = make_guess(env, "crane")
+    assert not is_done
+    assert env.state.game_state["guess_history"][0] == ("crane", ["X", "X", "Y", "X", "G"])
+
+
+def test_feedback_table_built_after_first_lookup(tmp_path, monkeypatch):
+    # A table built by another process after a miss is picked up without restarting
+    from hard_wordle import WordBank
+    import numpy as np
+
+    monkeypatch.setenv("HARD_WORDLE_DATA_DIR", str(tmp_path))
+    words = ["apple", "crane", "apply", "rates", "taser"]
+    bank = WordBank(words)
+    assert bank.feedback_table() is None
+    assert bank.feedback_table() is None
+
+    WordBank(words).build_feedback_table()
+    assert isinstance(bank.feedback_table(), np.memmap)
+    assert bank.feedback_table().shape == (5, 5)
+
+
+def test_remaining_candidates_follow_word_bank(hard_wordle_env, tmp_path, monkeypatch):
+    # Candidates are counted over the env's word bank, whether it is swapped in before or after a reset
+    from hard_wordle import WordBank
+
+    monkeypatch.setenv("HARD_WORDLE_DATA_DIR", str(tmp_path))
+    bank = WordBank(["apple", "crane", "apply", "rates", "taser"])
+    env = hard_wordle_env
+    make_guess(env, "rates")
+    env.word_bank = bank
+    assert env.remaining_candidates == 1  # of the new bank, only 'apple' scores X Y X Y X against 'rates'
+
+    env.reset()
+    env.state.game_state["secret_word"] = "apple"
+    assert env.remaining_candidates == 5
+    is_done, info = make_guess(env, "crane")
+    assert info["remaining_candidates"] == 1  # only 'apple' scores X X Y X G against 'crane'
+
+
+def test_hard_mode_constraints_repeated_letters():
+    # Two hinted P's (yellow + green) mean every later guess needs at least two P's
+    from hard_wordle import HardModeConstraints
+
+    constraints = HardModeConstraints(5)
+    constraints.update("paper", ["Y", "Y", "G", "Y", "X"])  # Secret: apple
+    assert constraints.greens == [None, None, "p", None, None]
+    assert constraints.min_counts == {"p": 2, "a": 1, "e": 1}
+    assert "at least 2 times" in constraints.violation("alpha")
+    assert constraints.violation("apple") is None
+
+
+def test_hard_mode_repeated_letter_violation(hard_wordle_env):
+    env = hard_wordle_env
+    make_guess(env, "paper") # Secret: apple. Feedback: Y Y G Y X -> two P's, an A and an E are required
+
+    # 'alpha' keeps the green P and contains an A, but only one P
+    is_done, info = make_guess(env, "alpha")
+    assert not is_done
+    assert "must contain letter 'P' at least 2 times" in info["reason"]
+    assert len(env.state.game_state["guess_history"]) == 1
+
+
+def test_remaining_candidates(hard_wordle_env):
+    env = hard_wordle_env
+    is_done, info = make_guess(env, "crane") # Secret: apple. Feedback: X X Y X G
+    remaining = info["remaining_candidates"]
+    assert 0 < remaining < len(env.word_list)
+    assert env.candidates[env.word_list.index("apple")]
+
+    # Invalid moves leave the candidate set untouched
+    is_done, info = env.step("apple")
+    assert info["remaining_candidates"] == remaining
+
+    is_done, info = make_guess(env, "apple")
+    assert is_done
+    assert info["remaining_candidates"] == 1
+
+
+def test_snapshot_restore_and_fork(hard_wordle_env):
+    env = hard_wordle_env
+    make_guess(env, "crane")  # A is yellow, E is green
+    make_guess(env, "plank")  # invalid: no E
+    snapshot = env.snapshot()
+    assert snapshot.words == ("crane",)
+    assert env.state.error_count == 1
+
+    fork = env.fork()
+    is_done, info = make_guess(fork, "apple")
+    assert is_done and info["reward"] == 1.0
+    # The original game is untouched by its fork
+    assert not env.state.done
+    assert env.state.game_state["guess_history"] == [("crane", ["X", "X", "Y", "X", "G"])]
+
+    is_done, info = make_guess(env, "taupe")
+    assert info["remaining_candidates"] < snapshot.remaining_candidates
+    env.restore(snapshot)
+    assert len(env.state.game_state["guess_history"]) == 1
+    assert env.remaining_candidates == snapshot.remaining_candidates
+    assert env.state.error_count == 1
+    is_done, info = make_guess(env, "plank")
+    assert info["reason"] == "Hard Mode violation: Letter 'E' must be in position 5."
+    assert env.state.error_count == 2
+
+
+def test_compact_history_keeps_latest_observation_only():
+    env = HardWordleEnv(word_length=5, num_guesses=6, compact_history=True)
+    env.reset()
+    env.state.game_state["secret_word"] = "apple"
+    reasoning = "<think>" + "long reasoning " * 1000 + "</think>"
+    make_guess(env, reasoning + "[crane]")
+    for _ in range(3):
+        is_done, info = make_guess(env, reasoning + "[plank]")  # E must stay in position 5
+    assert len(env.state.observations[0]) == 1
+    assert len(env.state.logs) == 1
+    assert all(len(message) < 200 for _, message, _ in env.state.observations[0])
+    assert "Hard Mode violation" in env.state.observations[0][-1][1]
+    assert env.move_log[0] == ("crane", 171, None)  # X X Y X G
+    assert env.move_log[1:] == [("plank", None, info["reason"])] * 3
+
+
+def test_metrics_count_phases_and_invalid_moves(hard_wordle_env, tmp_path):
+    import json
+    from hard_wordle import analyze_completion, disable_metrics, enable_metrics
+
+    metrics = enable_metrics()
+    try:
+        hard_wordle_env.state.game_state["secret_word"] = "apple"
+        make_guess(hard_wordle_env, "[crane]")
+        hard_wordle_env.step("crane")  # no brackets
+        make_guess(hard_wordle_env, "[apples]")
+        make_guess(hard_wordle_env, "[plank]")  # E must stay in position 5
+        make_guess(hard_wordle_env, "[crane]")  # repeated
+        analyze_completion(load_environment().parser, [{"role": "assistant", "content": "<guess>[apple]</guess>"}])
+    finally:
+        assert disable_metrics() is metrics
+
+    snapshot = metrics.snapshot()
+    assert snapshot["invalid_moves"] == {"format": 1, "length": 1, "green": 1, "repeat": 1}
+    assert snapshot["phases"]["step"]["count"] == 5
+    assert snapshot["phases"]["wordle_step"]["count"] == 2
+    assert snapshot["phases"]["candidates"]["count"] == 1
+    assert snapshot["phases"]["reward_analysis"]["count"] == 1
+    assert snapshot["phases"]["step"]["buckets"]["+Inf"] == 5
+
+    text = metrics.to_prometheus()
+    assert 'hard_wordle_phase_seconds_count{phase="step"} 5' in text
+    assert 'hard_wordle_invalid_moves_total{kind="green"} 1' in text
+    metrics.write_json(str(tmp_path / "metrics.json"))
+    assert json.loads((tmp_path / "metrics.json").read_text()) == json.loads(json.dumps(snapshot))
+
+    # Nothing is recorded once disabled
+    make_guess(hard_wordle_env, "[zzzzz]")
+    assert metrics.snapshot() == snapshot
+
+
+def test_batched_env_matches_per_game_env(hard_wordle_env):
+    # Every game in the batch must produce the same observations, rewards and done flags as HardWordleEnv
+    from hard_wordle import BatchedHardWordleEnv
+
+    scripts = [
+        ["[crane]", "[album]", "[apply]", "[apple]"],
+        ["apple", "[apples]", "[rates]", "[plank]", "[rates]", "[taser]"],
+        ["[paper]", "[alpha]", "[zzzzz]", "[apple]"],
+        ["[crane]", "[rates]", "[taser]", "[paper]", "[plank]", "[album]"],
+    ]
+    batch = BatchedHardWordleEnv(len(scripts), env=hard_wordle_env)
+    batch.reset(secrets=["apple"] * len(scripts))
+
+    expected = []
+    for script in scripts:
+        env = hard_wordle_env
+        env.reset()
+        env.state.game_state["secret_word"] = "apple"
+        steps = []
+        for action in script:
+            is_done, info = env.step(action)
+            if is_done:
+                observation = info["reason"]
+            elif "latest_observation" in info:
+                observation = info["latest_observation"]["content"]
+            else:
+                observation = env.get_observation()[1][-1][1]  # invalid-move message
+            steps.append((observation, info["reward"], is_done))
+            if is_done:
+                break
+        expected.append(steps)
+
+    for turn in range(max(len(script) for script in scripts)):
+        actions = [script[turn] if turn < len(script) else "" for script in scripts]
+        observations, rewards, dones = batch.step(actions)
+        for game, steps in enumerate(expected):
+            if turn < len(steps):
+                assert (observations[game], rewards[game], dones[game]) == steps[turn]
+
+
+def test_multi_board_scores_every_board_like_single_board():
+    # One guess is scored against all open boards, with the same feedback as a one-board game
+    from types import SimpleNamespace
+    from textarena.envs.Wordle.env import WordleEnv
+    from hard_wordle import MultiBoardHardWordleEnv
+
+    secrets = ["apple", "crane", "plank", "rates"]
+    env = ta.make(env_id="HardWordle-v0-quordle")
+    assert isinstance(env, MultiBoardHardWordleEnv) and env.num_boards == 4
+    env.reset()
+    env.state.game_state["secret_word"] = " ".join(secrets)
+
+    is_done, info = make_guess(env, "crane")
+    assert not is_done
+    word, feedback = env.state.game_state["guess_history"][-1]
+    for secret, marks in zip(secrets, feedback):
+        reference_env = SimpleNamespace(word_length=5, state=SimpleNamespace(game_state={"word_length": 5, "secret_word": secret}))
+        assert marks == WordleEnv._evaluate_guess(reference_env, "crane")
+    assert env.solved.tolist() == [False, True, False, False]
+    assert info["remaining_candidates"][1] == 1
+
+    # 'bland' breaks apple's green E but keeps plank's hints; hard mode only needs one open board
+    is_done, info = make_guess(env, "bland")
+    assert not is_done and "reason" not in info
+    # ... while 'album' respects no open board's hints
+    is_done, info = make_guess(env, "album")
+    assert info["reason"] == "Hard Mode violation: Letter 'E' must be in position 5."
+
+    for guess in ["apple", "plank", "rates"]:
+        is_done, info = make_guess(env, guess)
+    assert is_done and info["reward"] == 1
+    assert env.state.game_state["guess_history"][-1][1][:3] == [None, None, None]  # boards solved earlier
+
+
+def test_multi_board_snapshot_restore_and_fork():
+    env = ta.make(env_id="HardWordle-v0-quordle")
+    env.reset()
+    env.state.game_state["secret_word"] = "apple crane plank rates"
+    make_guess(env, "crane")  # solves board 2
+    snapshot = env.snapshot()
+    assert snapshot.words == ("crane",) and snapshot.solved.tolist() == [False, True, False, False]
+
+    fork = env.fork()
+    for guess in ["apple", "plank", "rates"]:
+        is_done, info = make_guess(fork, guess)
+    assert is_done and info["reward"] == 1
+    # The original game is untouched by its fork
+    assert not env.state.done
+    assert env.solved.tolist() == [False, True, False, False]
+    assert env.remaining_candidates == snapshot.remaining_candidates
+    assert len(env.state.game_state["guess_history"]) == 1
+
+    make_guess(env, "bland")
+    env.restore(snapshot)
+    assert env.state.game_state["guess_history"] == fork.state.game_state["guess_history"][:1]
+    assert env.remaining_candidates == snapshot.remaining_candidates
+    assert env.last_codes.tolist() == snapshot.last_codes.tolist()
+    is_done, info = make_guess(env, "album")
+    assert info["reason"] == "Hard Mode violation: Letter 'E' must be in position 5."
+
+
+def test_constraint_arrays_match_hard_mode_constraints():
+    # The array form used by batched and multi-board games gives the same verdicts and reasons
+    import random
+    import numpy as np
+    from hard_wordle import ConstraintArrays, HardModeConstraints, encode_words, feedback_patterns, score_guesses
+
+    rng = random.Random(0)
+    words = ["apple", "paper", "llama", "eerie", "geese", "crane", "speed", "abbey", "babes", "alley", "plank", "rates"]
+    for _ in range(50):
+        secret, *guesses = rng.sample(words, 4)
+        reference = HardModeConstraints(5)
+        arrays = ConstraintArrays(1, 5)
+        for turn, guess in enumerate(guesses[:2]):
+            code = int(score_guesses(encode_words([guess]), encode_words([secret]))[0, 0])
+            reference.update(guess, feedback_patterns(5)[code])
+            marks = (code // 3 ** np.arange(5)) % 3
+            arrays.update(np.array([0]), encode_words([guess]), marks[None, :], np.array([turn]))
+        for word in words:
+            assert arrays.violations(np.array([0]), encode_words([word])) == [reference.violation(word)]
+
+
+@pytest.mark.parametrize("word_length", [6, 7])
+def test_feedback_table_for_longer_words(tmp_path, word_length):
+    # 3**6 and 3**7 feedback codes no longer fit a uint8 and are stored as uint16
+    from types import SimpleNamespace
+    import numpy as np
+    from textarena.envs.Wordle.env import WordleEnv
+    from hard_wordle import WordBank, feedback_patterns
+
+    words = {6: ["planet", "plants", "letter", "settle", "coffee", "effect"],
+             7: ["parable", "drawers", "rewards", "letters", "settler", "balloon"]}[word_length]
+    bank = WordBank(words)
+    bank.build_feedback_table(str(tmp_path))
+    table = np.load(bank.feedback_table_path(str(tmp_path)))
+    assert table.dtype == np.uint16
+    patterns = feedback_patterns(word_length)
+    for i, guess in enumerate(words):
+        for j, secret in enumerate(words):
+            reference_env = SimpleNamespace(word_length=word_length, state=SimpleNamespace(game_state={"word_length": word_length, "secret_word": secret}))
+            assert list(patterns[table[i, j]]) == WordleEnv._evaluate_guess(reference_env, guess)
+
+
+def test_datasets_cached_on_disk(tmp_path, monkeypatch):
+    # The second load memory-maps the Arrow files written by the first instead of regenerating them
+    monkeypatch.setenv("HARD_WORDLE_DATA_DIR", str(tmp_path))
+    first = load_environment(num_train_examples=5, num_eval_examples=3)
+    second = load_environment(num_train_examples=5, num_eval_examples=3)
+    assert second.dataset["answer"] == first.dataset["answer"]
+    assert second.eval_dataset["answer"] == first.eval_dataset["answer"]
+    assert second.dataset.cache_files[0]["filename"].startswith(str(tmp_path))
+
+    # A different seed or size is a different cache entry
+    other = load_environment(num_train_examples=6, num_eval_examples=3)
+    assert other.dataset["answer"][:5] == first.dataset["answer"]
+    assert len(list(tmp_path.glob("hard_wordle_dataset_*"))) == 2
+
+
+def test_game_spec_cached_on_disk(tmp_path, monkeypatch):
+    # A warm load builds its datasets from the cached prompt and word list; the textarena env waits for the first turn
+    import asyncio
+    import hard_wordle_verifiers
+
+    monkeypatch.setenv("HARD_WORDLE_DATA_DIR", str(tmp_path))
+    monkeypatch.setattr(hard_wordle_verifiers, "words_corpus_digest", lambda: "corpus")
+    first = load_environment(num_train_examples=5, num_eval_examples=3)
+    assert len(list(tmp_path.glob("hard_wordle_game_*.json"))) == 1
+
+    made = []
+    make = ta.make
+    monkeypatch.setattr(ta, "make", lambda env_id: made.append(env_id) or make(env_id=env_id))
+    second = load_environment(num_train_examples=6, num_eval_examples=3)
+    assert made == []
+    assert second.dataset["prompt"][0] == first.dataset["prompt"][0]
+    assert second.dataset["answer"][:5] == first.dataset["answer"]
+
+    messages, state = asyncio.run(second.env_response([{"role": "assistant", "content": "<guess>[crane]</guess>"}], {"answer": "apple"}))
+    assert made == ["HardWordle-v0"]
+    assert "C R A N E" in messages[0]["content"]
+
+
+def test_streaming_dataset_matches_eager():
+    # Streaming rows are drawn on demand but follow the same seeded sequence as the eager datasets
+    from datasets import IterableDataset
+
+    eager = load_environment(num_train_examples=20, num_eval_examples=4)
+    streaming = load_environment(num_train_examples=20, num_eval_examples=4, streaming=True)
+    assert isinstance(streaming.dataset, IterableDataset)
+    assert [row["answer"] for row in streaming.dataset] == eager.dataset["answer"]
+    assert [row["prompt"] for row in streaming.dataset] == eager.dataset["prompt"]
+    assert streaming.eval_dataset["answer"] == eager.eval_dataset["answer"]
+    assert [row["answer"] for row in streaming.get_dataset(n=3)] == eager.dataset["answer"][:3]
+
+
+def test_solver_plays_legal_hard_mode_games(hard_wordle_env):
+    from hard_wordle_solver import HardModeSolver, OpeningBook
+
+    env = hard_wordle_env
+    solver = HardModeSolver.for_env(env)
+    solver.opening_book = OpeningBook("crane", {})  # skips the full-dictionary first turn
+    for secret in ("apple", "plank", "rates"):
+        reward, turns = solver.solve(env, secret)
+        assert reward == 1.0
+        assert turns <= 6
+        assert env.state.error_count == 0  # every guess passed the hard-mode and dictionary checks
+
+
+def test_solver_writes_baseline_rows(tmp_path):
+    # One scored row per eval answer, in the results format of evaluate_async
+    from hard_wordle import load_results
+    from hard_wordle_solver import write_baseline
+
+    env = load_environment(num_train_examples=1, num_eval_examples=4)
+    path = str(tmp_path / "baseline.jsonl")
+    summary = write_baseline(env, path)
+    rows = load_results(path)
+    assert rows["example_id"] == [0, 1, 2, 3]
+    assert rows["answer"] == env.eval_dataset["answer"]
+    assert rows["check_answer_reward_func"] == [1.0] * 4
+    assert all(score == 1.0 for score in rows["format_reward_func"])
+    assert summary["meta"]["model"] == "hard_mode_solver"
+    assert summary["reward"]["count"] == 4
+
+
+def test_opening_book_roundtrip(tmp_path):
+    from hard_wordle import WordBank
+    from hard_wordle_solver import HardModeSolver, OpeningBook, build_opening_book, partition_information
+    import numpy as np
+
+    bank = WordBank(["apple", "crane", "apply", "rates", "taser", "plank", "album"])
+    solver = HardModeSolver(bank)
+    path = build_opening_book(solver, directory=str(tmp_path))
+    book = OpeningBook.load(bank, str(tmp_path))
+    assert path.startswith(str(tmp_path))
+    assert book.first == solver.opening_book.first
+    assert book.second == solver.opening_book.second
+
+    # The book's first guess splits the answers at least as well as any other word
+    ids = np.arange(len(bank.words))
+    information = partition_information(bank.score_ids(ids, ids), 3 ** 5)
+    assert information[bank.index[book.first]] == information.max()
+
+
+def test_evaluate_async_scales_with_concurrency(stub_openai_server):
+    import asyncio
+    import time
+    from hard_wordle import make_async_client
+
+    # Every game plays [crane] until repeated-guess errors end it, so all runs make the same requests
+    env = load_environment(num_train_examples=1, num_eval_examples=8)
+    timings = {}
+    for max_in_flight in (1, 8):
+        client = make_async_client(base_url=stub_openai_server, api_key="stub", max_in_flight=max_in_flight)
+        start = time.perf_counter()
+        results = asyncio.run(env.evaluate_async(client=client, model="stub", max_in_flight=max_in_flight))
+        timings[max_in_flight] = time.perf_counter() - start
+        assert len(results.reward) == 8
+        assert all(len(completion) > 2 for completion in results.completion)
+    # With 8 requests in flight, 8 games should take close to an eighth of the serial wall-clock;
+    # openai's per-request transform of the whole conversation is CPU time the games can't overlap
+    assert timings[1] / timings[8] > 4
+
+
+def test_evaluate_async_sends_create_kwargs_like_evaluate(stub_openai_server):
+    # evaluate_async goes through chat.completions.create, so client kwargs are not sent as body fields
+    import asyncio
+    from hard_wordle import make_async_client
+
+    env = load_environment(num_train_examples=1, num_eval_examples=1)
+    client = make_async_client(base_url=stub_openai_server, api_key="stub", max_in_flight=2)
+    STUB_REQUESTS.clear()
+    asyncio.run(env.evaluate_async(client=client, model="stub", max_in_flight=2, num_examples=1,
+                                   sampling_args={"extra_body": {"top_k": 5}, "max_tokens": 64}))
+    assert STUB_REQUESTS
+    for body in STUB_REQUESTS:
+        assert body["top_k"] == 5 and "extra_body" not in body
+        assert body["max_completion_tokens"] == 64
+
+
+@pytest.mark.parametrize("suffix", [".jsonl", ".parquet"])
+def test_evaluate_async_streams_results(stub_openai_server, tmp_path, suffix):
+    import asyncio
+    import json
+    from hard_wordle import load_results, make_async_client
+
+    env = load_environment(num_train_examples=1, num_eval_examples=3)
+    client = make_async_client(base_url=stub_openai_server, api_key="stub")
+    path = str(tmp_path / f"results{suffix}")
+    results = asyncio.run(env.evaluate_async(client=client, model="stub", rollouts_per_example=2, results_path=path))
+
+    rows = load_results(path)
+    assert len(rows) == 6
+    assert sorted(zip(rows["example_id"], rows["rollout_id"])) == [(i, r) for i in range(3) for r in range(2)]
+    by_id = {(row["example_id"], row["rollout_id"]): row for row in rows}
+    for i, (answer, reward) in enumerate(zip(results.answer, results.reward)):
+        row = by_id[(i % 3, i // 3)]
+        assert row["answer"] == answer
+        assert row["reward"] == pytest.approx(reward)
+        assert row["check_answer_reward_func"] == results.metrics["check_answer_reward_func"][i]
+
+    with open(path + ".summary.json") as f:
+        summary = json.load(f)
+    assert summary["meta"]["model"] == "stub"
+    assert summary["reward"]["count"] == 6
+    assert summary["reward"]["mean"] == pytest.approx(sum(results.reward) / 6)
+
+
+def test_evaluate_async_records_with_scoring_workers(stub_openai_server, tmp_path):
+    # With a results path each rollout is scored as its game ends; scoring_workers still applies, with serial scores
+    import asyncio
+    from hard_wordle import load_results, make_async_client
+
+    rows = {}
+    for workers in (0, 2):
+        env = load_environment(num_train_examples=1, num_eval_examples=3, scoring_workers=workers)
+        client = make_async_client(base_url=stub_openai_server, api_key="stub")
+        path = str(tmp_path / f"results-{workers}.jsonl")
+        try:
+            asyncio.run(env.evaluate_async(client=client, model="stub", results_path=path, ledger_path=str(tmp_path / f"ledger-{workers}.jsonl")))
+            assert (env.rubric._executor is not None) == (workers > 1)
+        finally:
+            env.rubric.shutdown()
+        rows[workers] = sorted(load_results(path).to_list(), key=lambda row: row["example_id"])
+    for serial, parallel in zip(rows[0], rows[2]):
+        assert parallel["reward"] == serial["reward"]
+        assert parallel["partial_credit_reward_func"] == serial["partial_credit_reward_func"]
+
+
+def test_evaluate_async_resumes_from_ledger(stub_openai_server, tmp_path):
+    import asyncio
+    from hard_wordle import EvalLedger, make_async_client
+
+    env = load_environment(num_train_examples=1, num_eval_examples=2)
+    ledger_path = str(tmp_path / "ledger.jsonl")
+
+    def evaluate(base_url):
+        client = make_async_client(base_url=base_url, api_key="stub", max_retries=0)
+        return asyncio.run(env.evaluate_async(
+            client=client, model="stub", sampling_args={"max_tokens": 64}, rollouts_per_example=2, ledger_path=ledger_path,
+        ))
+
+    first = evaluate(stub_openai_server)
+    assert len(EvalLedger(ledger_path).rows) == 4
+
+    # Crash after two rollouts, partway through writing the third
+    with open(ledger_path) as f:
+        lines = f.readlines()
+    with open(ledger_path, "w") as f:
+        f.writelines(lines[:2])
+        f.write(lines[2][:40])
+    resumed = evaluate(stub_openai_server)
+    assert len(EvalLedger(ledger_path).rows) == 4
+    assert sum(state.get("resumed", False) for state in resumed.state) == 2
+    assert resumed.reward == first.reward
+    assert resumed.completion == first.completion
+
+    # Everything is in the ledger now, so no model is needed at all
+    replayed = evaluate("http://127.0.0.1:9/v1")
+    assert replayed.reward == first.reward
+    assert all(state["resumed"] for state in replayed.state)
+
+
+@pytest.mark.parametrize("policy", ["solver", "random"])
+def test_mock_model_server_plays_legal_games(policy):
+    # The mock server reads the feedback back out of each conversation, so every guess it sends is legal
+    from hard_wordle import make_async_client
+    from mock_model_server import LatencyModel, MockModelServer, MockPlayer
+
+    env = load_environment(num_train_examples=1, num_eval_examples=4)
+    player = MockPlayer.for_word_length(5, policy=policy, think_words=5)
+    with MockModelServer(player, LatencyModel("uniform", 5)) as server:
+        client = make_async_client(base_url=server.base_url, api_key="mock")
+        results = env.evaluate(client=client, model="mock", num_examples=4, max_concurrent=4)
+        stats = server.stats()
+
+    assistant = [message for completion in results.completion for message in completion if message["role"] == "assistant"]
+    user = [message["content"] for completion in results.completion for message in completion if message["role"] == "user"]
+    assert stats["requests"] == len(assistant) and stats["errors"] == 0
+    assert user and not any("invalid move" in content for content in user)
+    assert not any(content.startswith("[(") for content in user)  # text, not the repr of TextArena's observation list
+
+
+def test_mock_model_server_rollouts_earn_partial_credit():
+    # Partial credit reads the board rows of the feedback the model actually saw
+    from hard_wordle import make_async_client
+    from mock_model_server import LatencyModel, MockModelServer, MockPlayer
+
+    env = load_environment(num_train_examples=1, num_eval_examples=8)
+    player = MockPlayer.for_word_length(5, policy="random", think_words=5)
+    with MockModelServer(player, LatencyModel("uniform", 5)) as server:
+        client = make_async_client(base_url=server.base_url, api_key="mock")
+        results = env.evaluate(client=client, model="mock", num_examples=8, max_concurrent=4)
+
+    lost = [i for i, solved in enumerate(results.metrics["check_answer_reward_func"]) if not solved]
+    assert lost
+    assert all("Feedback:" not in message["content"] for i in lost for message in results.completion[i] if message["role"] == "user")
+    assert any(results.metrics["partial_credit_reward_func"][i] > 0 for i in lost)
+
+
+def test_response_cache_serves_repeated_prefixes(stub_openai_server, tmp_path):
+    import asyncio
+    from hard_wordle import make_async_client
+
+    def evaluate(base_url, temperature):
+        env = load_environment(num_train_examples=1, num_eval_examples=4, response_cache_path=str(tmp_path / "cache.sqlite"))
+        client = make_async_client(base_url=base_url, api_key="stub", max_retries=0)
+        results = asyncio.run(env.evaluate_async(client=client, model="stub", sampling_args={"temperature": temperature}))
+        return results, env.response_cache.stats()
+
+    # All four games open with the same conversation, so the first turn is requested once
+    first, stats = evaluate(stub_openai_server, 0.0)
+    requests = sum(len(state["responses"]) for state in first.state)
+    assert stats["misses"] < requests
+    assert stats["hits"] + stats["misses"] == requests
+    assert stats["hits"] >= 3
+
+    # A rerun replays every turn from disk
+    second, stats = evaluate("http://127.0.0.1:9/v1", 0.0)
+    assert stats == {"hits": requests, "misses": 0, "hit_rate": 1.0}
+    assert second.completion == first.completion
+    assert second.reward == first.reward
+
+    # Sampled requests always go to the model
+    _, stats = evaluate(stub_openai_server, 0.7)
+    assert stats["hits"] == stats["misses"] == 0
+
+
+def test_response_cache_key_ignores_max_tokens_rename(stub_openai_server, tmp_path):
+    # The first request renames max_tokens in the shared sampling_args, which must not change the key
+    import asyncio
+    from hard_wordle import ResponseCache, make_async_client
+
+    assert ResponseCache.key("stub", {"max_tokens": 64, "n": 1, "extra_body": {}}, []) == ResponseCache.key(
+        "stub", {"max_completion_tokens": 64}, [])
+
+    env = load_environment(num_train_examples=1, num_eval_examples=1, response_cache_path=str(tmp_path / "cache.sqlite"))
+    client = make_async_client(base_url=stub_openai_server, api_key="stub", max_retries=0)
+    sampling_args = {"temperature": 0.0, "max_tokens": 64}
+    prompt = [{"role": "user", "content": "Guess a word."}]
+
+    async def ask(times):
+        return await asyncio.gather(*(env.get_model_response(client, "stub", prompt, sampling_args=sampling_args)
+                                      for _ in range(times)))
+
+    async def ask_twice_then_again():
+        return await ask(2) + await ask(1)
+
+    STUB_REQUESTS.clear()
+    first, second, third = asyncio.run(ask_twice_then_again())
+    assert len(STUB_REQUESTS) == 1
+    assert first.choices[0].message.content == second.choices[0].message.content == third.choices[0].message.content
+    assert env.response_cache.stats()["misses"] == 1
+
+
+def test_difficulty_index_roundtrip(tmp_path):
+    import numpy as np
+    from hard_wordle import DifficultyIndex, WordBank
+    from hard_wordle_solver import HardModeSolver, build_difficulty_index
+
+    bank = WordBank(["light", "might", "night", "sight", "tight", "crane", "plank", "album", "apple"])
+    path = build_difficulty_index(HardModeSolver(bank), directory=str(tmp_path))
+    index = DifficultyIndex.load(bank, str(tmp_path))
+    assert path.endswith(".npz")
+    assert index.solver_depth.dtype == np.uint8
+    assert list(index.cluster_size) == [5, 5, 5, 5, 5, 1, 1, 1, 1]  # the _ight trap
+    assert all(1 <= index.depth(word) <= 7 for word in bank.words)
+    # Solving one of five look-alikes takes at least as long as any other word
+    assert index.depth("tight") == index.solver_depth.max()
+
+
+def test_load_environment_difficulty_sampling(tmp_path, monkeypatch):
+    import numpy as np
+    from hard_wordle import DifficultyIndex, FEEDBACK_TABLE_DIR_ENV_VAR
+
+    uniform = load_environment(num_train_examples=40, num_eval_examples=12)
+    monkeypatch.setenv(FEEDBACK_TABLE_DIR_ENV_VAR, str(tmp_path))
+    with pytest.raises(FileNotFoundError):
+        load_environment(sampling="stratified")
+
+    # Synthetic depths 1-6, so each stratum is large
+    bank = HardWordleEnv().word_bank
+    depths = np.arange(len(bank.words)) % 6 + 1
+    index = DifficultyIndex(bank.words, depths, np.ones(len(bank.words)), np.zeros(len(bank.words)))
+    index.save(DifficultyIndex.path(bank))
+
+    stratified = load_environment(num_train_examples=40, num_eval_examples=12, sampling="stratified", difficulty_range=[2, 4])
+    eval_depths = [index.depth(answer) for answer in stratified.eval_dataset["answer"]]
+    assert sorted(eval_depths) == [2] * 4 + [3] * 4 + [4] * 4
+
+    curriculum = load_environment(num_train_examples=40, num_eval_examples=12, sampling="curriculum")
+    train_depths = [index.depth(answer) for answer in curriculum.dataset["answer"]]
+    assert train_depths == sorted(train_depths)
+    assert sorted(curriculum.dataset["answer"]) == sorted(uniform.dataset["answer"])
+    assert curriculum.eval_dataset["answer"] == uniform.eval_dataset["answer"]
+
+    # Rebuilding the index with other depths must not serve the splits cached for the old one
+    rebuilt = DifficultyIndex(bank.words, depths % 3 + 1, np.ones(len(bank.words)), np.zeros(len(bank.words)))
+    rebuilt.save(DifficultyIndex.path(bank))
+    assert rebuilt.digest != index.digest
+    stratified = load_environment(num_train_examples=40, num_eval_examples=12, sampling="stratified", difficulty_range=[2, 4])
+    assert sorted(rebuilt.depth(answer) for answer in stratified.eval_dataset["answer"]) == [2] * 6 + [3] * 6